@@ -0,0 +1,67 @@
+# benchmarks/bench_serializers.py
+"""
+Compare snapshot formats on a synthetic score list.
+
+    python -m benchmarks.bench_serializers [--users 500000]
+
+Prints size, encode and decode time for the legacy indent=2 JSON, the
+compact JSON now written by default and msgpack (if installed).
+"""
+import argparse
+import random
+import time
+from utils.storage import encode_scores, decode_scores, msgpack
+
+
+def make_scores(n: int) -> list[dict]:
+    rng = random.Random(42)
+    scores = []
+    for i in range(n):
+        entry = {
+            "username": f"@player{i}",
+            "first_name": f"First{i % 997}",
+            "last_name": "",
+            "user_id": str(100000000 + i),
+            "score": rng.randint(0, 50000),
+            "registered_at": "2025-05-01T12:00:00-04:00",
+        }
+        if i % 10 == 0:
+            entry["tasks_done"] = ["follow_x", "join_channel"]
+        if i % 50 == 0:
+            entry["referrals"] = [{
+                "ref_user_id": str(200000000 + i),
+                "ref_username": f"@friend{i}",
+                "ref_first_name": "", "ref_last_name": "",
+                "timestamp": "2025-05-02T12:00:00-04:00",
+                "reward": 10000, "before_score": 10, "after_score": 10010,
+            }]
+        scores.append(entry)
+    return scores
+
+
+def bench(scores, fmt):
+    start = time.perf_counter()
+    data = encode_scores(scores, fmt)
+    encoded = time.perf_counter()
+    decode_scores(data)
+    decoded = time.perf_counter()
+    return len(data), encoded - start, decoded - encoded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500_000)
+    args = parser.parse_args()
+
+    scores = make_scores(args.users)
+    formats = ["json-pretty", "json"] + (["msgpack"] if msgpack else [])
+    base_size = None
+    print(f"{'format':<12} {'size MB':>9} {'vs legacy':>9} {'encode s':>9} {'decode s':>9}")
+    for fmt in formats:
+        size, enc, dec = bench(scores, fmt)
+        base_size = base_size or size
+        print(f"{fmt:<12} {size / 1e6:>9.1f} {size / base_size:>9.0%} {enc:>9.2f} {dec:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,30 +3,37 @@ from flask_cors import CORS
 import logging
 import sys
 import os
+import atexit
+import signal
 from utils.logging import log_event
-from utils.storage import backup_scores
+from utils.storage import (
+    backup_scores, init_score_store, shutdown_score_store,
+    compact_scores, prune_expired_backups, warm_score_caches, COMPACT_INTERVAL,
+)
+from utils import maintenance
 from routes.debug_tools.subscriptions import auto_backup_subscriptions
-from flask_apscheduler import APScheduler
 
 # ✅ Ensure logs print immediately to Railway logs panel
 logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
 
-# ✅ App config for APScheduler
-class Config:
-    SCHEDULER_API_ENABLED = True
-
-# ✅ Initialize app and scheduler
+# ✅ Initialize app
 app = Flask(__name__)
-app.config.from_object(Config())
 app.secret_key = os.getenv("SECRET_KEY", "dev_secret_for_debug_only")
 
-scheduler = APScheduler()
-scheduler.init_app(app)
+# ✅ Load scores into memory once; flush pending writes on exit
+init_score_store()
+atexit.register(shutdown_score_store)
+
+# ✅ Periodic jobs: shared ones run in one elected worker, warmup in each
+maintenance.register("backup_scores", backup_scores, 6 * 3600)
+maintenance.register("backup_subscriptions", auto_backup_subscriptions, 24 * 3600)
+maintenance.register("prune_backups", prune_expired_backups, 24 * 3600)
+maintenance.register("compact_scores", compact_scores, COMPACT_INTERVAL, quiet=True)
+maintenance.register("warm_caches", warm_score_caches, 30, every_worker=True, quiet=True)
+maintenance.start()
 
-# ✅ Add scheduled jobs
-scheduler.add_job(id="regular_backup", func=backup_scores, trigger="interval", hours=6)
-scheduler.add_job(id="daily_subscription_backup", func=auto_backup_subscriptions, trigger="interval", hours=24)
-scheduler.start()
+def _handle_sigterm(signum, frame):
+    sys.exit(0)  # runs atexit hooks, including the score flush
 
 # ✅ Import blueprints
 from routes.user import user_routes
@@ -45,7 +52,11 @@ log_event("🚀 Initializing Flask app")
 
 # ✅ Enable CORS for frontend
 try:
-    CORS(app, origins=["https://oscurantismo.github.io"])
+    CORS(
+        app,
+        origins=["https://oscurantismo.github.io"],
+        expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count", "X-Leaderboard-Version"],
+    )
     log_event("✅ CORS applied for GitHub Pages")
 except Exception as e:
     log_event(f"❌ CORS setup failed: {e}")
@@ -64,8 +75,10 @@ register_logging_routes(app)
 
 log_event("✅ All blueprints registered")
 
-# ✅ Run the app
+# ✅ Run the app (local development; production runs gunicorn with threaded
+# workers, see Procfile, whose own SIGTERM handling exits through atexit)
 if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, _handle_sigterm)
     port = int(os.environ.get("PORT", 5000))
     try:
         log_event(f"🟢 Starting Flask app on port {port}")
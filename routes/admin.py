@@ -1,7 +1,10 @@
 import json
-from flask import Blueprint, request, redirect
+from flask import Blueprint, request, redirect, jsonify
 import os
-from utils.storage import BACKUP_FOLDER, SCORES_FILE
+from utils.storage import (
+    BACKUP_FOLDER, replace_scores, decode_scores, read_snapshot, is_snapshot_file, restore_scores_at,
+)
+from utils.timeutils import parse_gmt4
 from utils.logging import log_event
 
 admin_routes = Blueprint("admin_routes", __name__)
@@ -10,7 +13,7 @@ admin_routes = Blueprint("admin_routes", __name__)
 def restore_backup():
     filename = request.args.get("file")
 
-    if not filename or not filename.endswith(".json"):
+    if not filename or not is_snapshot_file(filename):
         return "❌ Invalid or missing filename."
 
     if "/" in filename or ".." in filename:
@@ -22,11 +25,10 @@ def restore_backup():
         return f"❌ Backup not found: {filename}"
 
     try:
-        with open(backup_path, "r") as f:
-            data = json.load(f)  # ✅ Safely parse JSON
+        data = read_snapshot(backup_path)  # ✅ Safely parse (JSON or msgpack)
 
-        with open(SCORES_FILE, "w") as f:
-            json.dump(data, f, indent=2)  # ✅ Write clean JSON
+        if not replace_scores(data):  # ✅ Swap into memory + write atomically
+            return f"❌ Restore failed — invalid scores format in {filename}", 400
 
         log_event(f"🔁 Restored scores.json from backup: {filename}")
         return f"✅ Successfully restored scores.json from: {filename}"
@@ -37,19 +39,39 @@ def restore_backup():
         log_event(f"❌ Restore failed: {e}")
         return f"❌ Restore failed: {e}", 500
 
+@admin_routes.route("/restore-point", methods=["GET", "POST"])
+def restore_point():
+    """Rebuild scores as of ?at=<ISO time or unix seconds>; ?dry_run=1 only reports the diff."""
+    at = request.values.get("at")
+    dry_run = request.values.get("dry_run", "").lower() in ("1", "true", "yes")
+    try:
+        target = parse_gmt4(at).timestamp()
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"error": "Missing or invalid 'at' (ISO 8601 or unix seconds)"}), 400
+
+    try:
+        report = restore_scores_at(target, dry_run=dry_run)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        log_event(f"❌ Point-in-time restore failed: {e}")
+        return jsonify({"error": f"Restore failed: {e}"}), 500
+    report["dry_run"] = dry_run
+    return jsonify(report)
+
 @admin_routes.route("/upload-scores", methods=["POST"])
 def upload_scores():
     try:
         uploaded_file = request.files.get("file")
-        if not uploaded_file or not uploaded_file.filename.endswith(".json"):
-            return "❌ Invalid file. Only .json files are allowed.", 400
+        if not uploaded_file or not is_snapshot_file(uploaded_file.filename):
+            return "❌ Invalid file. Only .json or .msgpack files are allowed.", 400
 
         file_data = uploaded_file.read()
-        data = json.loads(file_data)  # Check it's valid JSON
+        data = decode_scores(file_data)  # Check it's a valid snapshot
 
-        # ✅ Overwrite scores.json
-        with open(SCORES_FILE, "w") as f:
-            f.write(file_data.decode("utf-8"))
+        # ✅ Overwrite scores.json (and the in-memory store)
+        if not replace_scores(data):
+            return "❌ Upload failed — invalid scores format.", 400
 
         log_event("✅ scores.json manually uploaded via /upload-scores")
         return redirect("/debug-logs")
@@ -16,10 +16,13 @@ def require_login():
         "/manual-tools",
         "/download-latest-backup",
         "/download-backup",
+        "/export-scores",
         "/preview-backup",
         "/delete-backup",
         "/backups",
-        "/user-logs"
+        "/restore-point",
+        "/user-logs",
+        "/storage-stats"
     ]
 
     request_path = request.path
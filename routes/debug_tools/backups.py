@@ -1,33 +1,33 @@
-from flask import Blueprint, request, redirect, abort, send_from_directory, render_template_string
+from flask import Blueprint, request, redirect, abort, send_from_directory, render_template_string, Response
 import os
 import json
-import time
-from datetime import datetime, timedelta
+import codecs
 from utils.timeutils import gmt4_now
-from utils.storage import BACKUP_FOLDER, backup_scores, SCORES_FILE, save_scores
+from utils.storage import (
+    BACKUP_FOLDER, backup_scores, SCORES_FILE, save_scores,
+    iter_scores, encode_scores, decode_scores, read_snapshot, is_snapshot_file,
+    prune_backup_shards, list_backups, latest_backup, register_backup, forget_backup,
+    backup_dependents,
+)
 from utils.logging import log_event
-from pytz import timezone
-
-gmt4 = timezone("America/Toronto")
+from utils import backup_store
+from utils.snapshot_io import MSGPACK_MAGIC, SHARD_BACKUP_FOLDER, msgpack
+from utils.snapshot_index import INDEXED_MAGIC, IndexedSnapshot
 
 backup_routes = Blueprint("backup_routes", __name__)
 
 @backup_routes.route("/download-latest-backup", methods=["POST"])
 def download_latest_backup():
     try:
-        backup_scores(tag="manual")
-        time.sleep(1)
-
-        # Find most recent _manual backup
-        matching = sorted([
-            f for f in os.listdir(BACKUP_FOLDER)
-            if f.endswith("_manual.json")
-        ], key=lambda f: os.path.getmtime(os.path.join(BACKUP_FOLDER, f)), reverse=True)
+        filename = backup_scores(tag="manual")
+        if not filename:
+            # Backup failed; fall back to the newest manual one on record
+            latest = latest_backup(tag="manual")
+            if not latest:
+                raise FileNotFoundError("No recent manual backup found")
+            filename = latest["file"]
 
-        if not matching:
-            raise FileNotFoundError("No recent manual backup found")
-
-        return redirect(f"/download-backup?file={matching[0]}")
+        return redirect(f"/download-backup?file={filename}")
     except Exception as e:
         log_event(f"❌ Failed to create manual backup: {e}")
         return f"❌ Failed to create backup: {e}", 500
@@ -42,6 +42,8 @@ def upload_backup():
         timestamp = gmt4_now().strftime("%Y%m%d_%H%M%S")
         save_path = os.path.join(BACKUP_FOLDER, f"leaderboard_backup_{timestamp}.json")
         file.save(save_path)
+        if not register_backup(os.path.basename(save_path)):
+            log_event(f"⚠️ Uploaded backup {save_path} did not validate")
         log_event(f"✅ Admin uploaded backup {save_path}")
         return redirect("/backups")
     except Exception as e:
@@ -50,64 +52,277 @@ def upload_backup():
 @backup_routes.route("/download-backup")
 def download_backup():
     filename = request.args.get("file")
-    if not filename or not filename.endswith(".json") or "/" in filename or "\\" in filename:
+    if not filename or not is_snapshot_file(filename) or "/" in filename or "\\" in filename:
         return abort(400, "Invalid filename")
     path = os.path.join(BACKUP_FOLDER, filename)
     if not os.path.exists(path):
         return abort(404, "File not found")
+    manifest = backup_store.load_manifest(path)
+    if manifest is not None:
+        # Chunked backups are reassembled on the fly, one chunk in memory at a time
+        pretty = request.args.get("format") == "json"
+        return Response(
+            backup_store.stream_json(manifest, pretty=pretty),
+            mimetype="application/json",
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+    if request.args.get("format") == "json":
+        # Convert compact/sharded backups so admins always get plain JSON
+        json_name = os.path.splitext(filename)[0] + ".json"
+        return Response(
+            encode_scores(read_snapshot(path), "json-pretty"),
+            mimetype="application/json",
+            headers={"Content-Disposition": f"attachment; filename={json_name}"},
+        )
     return send_from_directory(BACKUP_FOLDER, filename, as_attachment=True)
 
+@backup_routes.route("/export-scores")
+def export_scores():
+    """Download the live scores as pretty JSON, whatever the storage format.
+
+    Streamed entry by entry, without loading the store in this worker.
+    """
+    return Response(
+        backup_store.json_pieces(iter_scores(), pretty=True),
+        mimetype="application/json",
+        headers={"Content-Disposition": "attachment; filename=scores_export.json"},
+    )
+
 @backup_routes.route("/delete-backup")
 def delete_backup():
     filename = request.args.get("file")
-    if not filename or "/" in filename or "\\" in filename or not filename.endswith(".json"):
+    if not filename or "/" in filename or "\\" in filename or not is_snapshot_file(filename):
         return abort(400, "Invalid file name.")
     full_path = os.path.join(BACKUP_FOLDER, filename)
     if not os.path.exists(full_path):
         return abort(404, "File not found")
+    dependents = backup_dependents(filename)
+    if dependents:
+        return abort(409, f"Delta backup {dependents[0]} is built on this file; delete it first.")
     os.remove(full_path)
+    forget_backup(filename)
+    prune_backup_shards()
     log_event(f"🗑️ Deleted backup: {filename}")
     return redirect("/backups")
 
+PREVIEW_LINES = 500             # default and ...
+PREVIEW_MAX_LINES = 5000        # ... largest line range served
+PREVIEW_MAX_BYTES = 1024 * 1024 # hard cap on any preview response
+READ_CHUNK = 64 * 1024
+BACKUPS_PER_PAGE = 50
+
+
+def _iter_json_array(f):
+    """Yield the elements of a JSON array file one by one, reading as little as needed."""
+    decoder = json.JSONDecoder()
+    # Incremental: a multibyte character split across two reads decodes whole
+    text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buf, pos, eof = "", 0, False
+
+    def more():
+        nonlocal buf, pos, eof
+        chunk = f.read(READ_CHUNK)
+        eof = not chunk
+        buf, pos = buf[pos:] + text.decode(chunk, final=eof), 0
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,[":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            entry, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof:
+                return
+            more()
+            continue
+        if end == len(buf) and not eof:
+            more()  # a number could continue in the next chunk
+            continue
+        pos = end
+        yield entry
+
+
+def _file_chunks(path, offset=0, length=None):
+    """Bytes [offset, offset + length) of a file, read from there on, not from the start."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while length is None or length > 0:
+            chunk = f.read(READ_CHUNK if length is None else min(READ_CHUNK, length))
+            if not chunk:
+                return
+            if length is not None:
+                length -= len(chunk)
+            yield chunk
+
+
+def _head(path):
+    with open(path, "rb") as f:
+        return f.read(READ_CHUNK)
+
+
+_MSGPACK_MAPS = {*range(0x80, 0x90), 0xDE, 0xDF}  # fixmap, map16 and map32 type bytes
+
+
+def _holds_manifest(head):
+    """True if a file starting with head is a sharded or delta manifest, not the data."""
+    if head.startswith(MSGPACK_MAGIC):
+        return len(head) > len(MSGPACK_MAGIC) and head[len(MSGPACK_MAGIC)] in _MSGPACK_MAPS
+    return head.lstrip().startswith(b"{")
+
+
+def _read_manifest(path):
+    """A sharded or delta backup's own (small) document."""
+    with open(path, "rb") as f:
+        data = decode_scores(f.read())
+    if not isinstance(data, dict) or data.get("format") not in ("sharded", "delta"):
+        raise ValueError("not a sharded or delta backup")
+    return data
+
+
+def _iter_backup(path):
+    """Entries of a backup, decoded as they are read.
+
+    Sharded backups are read shard by shard; a delta patches its base as
+    the base streams past, then appends the users the base did not have.
+    """
+    manifest = backup_store.load_manifest(path)
+    if manifest is not None:
+        if manifest["kind"] == "records":
+            yield from backup_store.iter_records(manifest)
+        else:
+            yield from read_snapshot(path)
+        return
+    head = _head(path)
+    if _holds_manifest(head):
+        data = _read_manifest(path)
+        if data["format"] == "sharded":
+            for i in range(data["shards"]):
+                yield from _iter_backup(os.path.join(SHARD_BACKUP_FOLDER, data["files"][str(i)]))
+        else:
+            changed = {u["user_id"]: u for u in data["users"]}
+            for entry in _iter_backup(os.path.join(os.path.dirname(path), data["base"])):
+                yield changed.pop(entry.get("user_id"), entry)
+            yield from changed.values()
+    elif head.startswith(MSGPACK_MAGIC):
+        if msgpack is None:
+            raise ValueError("msgpack snapshot found but msgpack is not installed")
+        with open(path, "rb") as f:
+            f.seek(len(MSGPACK_MAGIC))
+            unpacker = msgpack.Unpacker(f, raw=False)
+            for _ in range(unpacker.read_array_header()):
+                yield unpacker.unpack()
+    elif head.startswith(INDEXED_MAGIC):
+        snapshot = IndexedSnapshot(path)
+        try:
+            yield from snapshot
+        finally:
+            snapshot.close()
+    else:
+        with open(path, "rb") as f:
+            yield from _iter_json_array(f)
+
+
+def _is_composite(path):
+    """True for backups whose file is a manifest rather than the data itself."""
+    return backup_store.load_manifest(path) is not None or _holds_manifest(_head(path))
+
+
+def _pretty_pieces(path):
+    """The backup as pretty JSON, produced lazily."""
+    manifest = backup_store.load_manifest(path)
+    if manifest is not None:
+        return backup_store.stream_json(manifest, pretty=True)
+    if _head(path).startswith(b"[\n  "):
+        return _file_chunks(path)  # already pretty
+    return backup_store.json_pieces(_iter_backup(path), pretty=True)
+
+
+def _byte_range(pieces, offset, length):
+    """Bytes [offset, offset + length) of a stream of pieces."""
+    for piece in pieces:
+        if offset >= len(piece):
+            offset -= len(piece)
+            continue
+        piece = piece[offset:offset + length]
+        offset = 0
+        length -= len(piece)
+        yield piece
+        if length <= 0:
+            return
+
+
+def _line_range(pieces, start, count, max_bytes):
+    """Lines [start, start + count) of a stream of pieces, at most max_bytes in total."""
+    line, sent = 0, 0
+    for piece in pieces:
+        for part in piece.splitlines(keepends=True):
+            if line >= start:
+                part = part[:max_bytes - sent]
+                sent += len(part)
+                yield part
+                if sent >= max_bytes:
+                    return
+            if part.endswith(b"\n"):
+                line += 1
+                if line >= start + count:
+                    return
+
+
+def _int_arg(name, default, low, high):
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        abort(400, f"Invalid {name}")
+    return max(low, min(value, high))
+
+
 @backup_routes.route("/preview-backup")
 def preview_backup():
+    """Stream part of a backup.
+
+    ?start=&lines= select pretty-printed JSON lines (default the first 500);
+    ?offset=&length= select raw bytes of the stored file, or of the
+    resolved compact JSON for chunked, sharded and delta backups. Files
+    are decoded as they are read and reading stops once the range is
+    served; raw byte ranges seek straight to the offset.
+    """
     filename = request.args.get("file")
-    if not filename or "/" in filename or "\\" in filename or not filename.endswith(".json"):
+    if not filename or "/" in filename or "\\" in filename or not is_snapshot_file(filename):
         return abort(400, "Invalid file name.")
     path = os.path.join(BACKUP_FOLDER, filename)
     if not os.path.exists(path):
         return abort(404, "File not found")
+    by_bytes = "offset" in request.args or "length" in request.args
+    if by_bytes:
+        offset = _int_arg("offset", 0, 0, 1 << 62)
+        length = _int_arg("length", READ_CHUNK, 1, PREVIEW_MAX_BYTES)
+    else:
+        start = _int_arg("start", 0, 0, 1 << 62)
+        lines = _int_arg("lines", PREVIEW_LINES, 1, PREVIEW_MAX_LINES)
     try:
-        with open(path, "r") as f:
-            return "".join(f.readlines()[:500])
+        if by_bytes and _is_composite(path):
+            manifest = backup_store.load_manifest(path)
+            if manifest is not None:
+                source = backup_store.stream_json(manifest)
+            else:
+                source = backup_store.json_pieces(_iter_backup(path))
+            body = _byte_range(source, offset, length)
+        elif by_bytes:
+            body = _file_chunks(path, offset, length)
+        else:
+            body = _line_range(_pretty_pieces(path), start, lines, PREVIEW_MAX_BYTES)
+        first = next(body, b"")  # surface read errors before the response starts
     except Exception as e:
         return f"❌ Failed to preview file: {e}"
 
-@backup_routes.route("/backups")
-def view_backups():
-    try:
-        cutoff = gmt4_now() - timedelta(weeks=3)
-        files = []
-
-        for filename in os.listdir(BACKUP_FOLDER):
-            if filename.endswith(".json"):
-                path = os.path.join(BACKUP_FOLDER, filename)
-                try:
-                    mtime = datetime.fromtimestamp(os.path.getmtime(path), tz=gmt4)
-                    if mtime < cutoff:
-                        os.remove(path)
-                        continue
-                    files.append((mtime, filename))
-                except Exception as e:
-                    log_event(f"⚠️ Skipped file {filename} due to error: {e}")
-
-
-        sorted_files = sorted(files, reverse=True)
+    def stream():
+        yield first
+        yield from body
+    return Response(stream(), mimetype="text/plain")
 
-    except Exception as e:
-        return f"<p>❌ Could not read backup directory: {e}</p>"
-
-    html = """
+BACKUPS_TEMPLATE = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -209,6 +424,8 @@ def view_backups():
             <button class="btn">💾 Create + Download Manual Backup</button>
         </form>
 
+        <p><a class="btn" href="/export-scores">⬇️ Export current scores (JSON)</a></p>
+
         <form action="/upload-scores" method="post" enctype="multipart/form-data">
             <label><b>Upload scores.json</b></label><br>
             <input type="file" name="file" accept=".json" required>
@@ -221,26 +438,50 @@ def view_backups():
             <button class="btn">⬆️ Upload Backup</button>
         </form>
 
+        <p>{{ total }} backups · page {{ page }} of {{ pages }}</p>
         <ul>
-    """
-
-    for ts, filename in sorted_files:
-        html += f"""
+        {% for b in backups %}
         <li>
-            {filename}
+            <span>{{ b.file }}<br><small>{{ b.details }}</small></span>
             <div class="actions">
-                <a class="btn" href="/download-backup?file={filename}">Download</a>
-                <button class="btn" onclick="togglePreview('{filename}')">Preview</button>
-                <button class="btn danger" onclick="confirmDelete('{filename}')">Delete</button>
+                <a class="btn" href="/download-backup?file={{ b.file }}">Download</a>
+                <a class="btn" href="/download-backup?file={{ b.file }}&format=json">JSON</a>
+                <button class="btn" onclick="togglePreview('{{ b.file }}')">Preview</button>
+                <button class="btn danger" onclick="confirmDelete('{{ b.file }}')">Delete</button>
             </div>
         </li>
-        <pre class="preview-box" id="preview-{filename}"></pre>
-        """
-
-    html += """
+        <pre class="preview-box" id="preview-{{ b.file }}" style="display: none"></pre>
+        {% endfor %}
         </ul>
+
+        <p>
+        {% if page > 1 %}<a class="btn" href="/backups?page={{ page - 1 }}">← Newer</a>{% endif %}
+        {% if page < pages %}<a class="btn" href="/backups?page={{ page + 1 }}">Older →</a>{% endif %}
+        </p>
     </body>
     </html>
-    """
+"""
+
+@backup_routes.route("/backups")
+def view_backups():
+    """One page of the backup catalog; no file is opened or stat-ed."""
+    try:
+        records = list_backups()
+    except Exception as e:
+        return f"<p>❌ Could not read backup catalog: {e}</p>"
+
+    per_page = _int_arg("per_page", BACKUPS_PER_PAGE, 1, 500)
+    pages = max(1, -(-len(records) // per_page))
+    page = _int_arg("page", 1, 1, pages)
+
+    backups = []
+    for record in records[(page - 1) * per_page:page * per_page]:
+        details = [record["timestamp"], f"{record['size'] / 1024:.1f} KB"]
+        if record["records"] is not None:
+            details.append(f"{record['records']} users")
+        if record.get("base"):
+            details.append(f"Δ on {record['base']}")
+        details.append({True: "✅ valid", False: "❌ invalid", None: "❔ unchecked"}[record["validated"]])
+        backups.append({"file": record["file"], "details": " · ".join(details)})
 
-    return html
+    return render_template_string(BACKUPS_TEMPLATE, backups=backups, total=len(records), page=page, pages=pages)
@@ -1,8 +1,9 @@
 from flask import Blueprint, request, send_file
 import os
+from utils.paths import DATA_DIR
 
 log_routes = Blueprint("log_routes", __name__)
-LOG_PATH = "/app/data/logs.txt"
+LOG_PATH = os.path.join(DATA_DIR, "logs.txt")
 
 @log_routes.route("/download-logs")
 def download_logs():
@@ -93,6 +94,7 @@ def view_logs():
             <a href="/download-logs">⬇️ Download logs.txt</a>
             <a href="/reward-logs">⬇️ Reward logs</a>
             <a href="/subscription-dashboard">🔔 Subscriptions</a>
+            <a href="/storage-stats">📊 Storage stats</a>
         </div>
 
         <div class="filter-row">
@@ -0,0 +1,14 @@
+from flask import Blueprint, jsonify
+from utils.storage import snapshot_cache_stats, leaderboard_stats
+from utils import maintenance, broadcast
+
+metrics_routes = Blueprint("metrics_routes", __name__)
+
+@metrics_routes.route("/storage-stats")
+def storage_stats():
+    return jsonify({
+        "snapshot_cache": snapshot_cache_stats(),
+        "leaderboard": leaderboard_stats(),
+        "maintenance": maintenance.stats(),
+        "streams": broadcast.stats(),
+    })
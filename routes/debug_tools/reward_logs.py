@@ -2,9 +2,10 @@
 import os, json
 from flask import Blueprint, request, render_template_string
 from routes.rewards import ensure_rewards_file  # ✅ (optional)
+from utils.paths import DATA_DIR
 
 reward_logs_bp = Blueprint("reward_logs", __name__)
-REWARDS_FILE = "/app/data/rewards.json"
+REWARDS_FILE = os.path.join(DATA_DIR, "rewards.json")
 
 @reward_logs_bp.route("/reward-logs")
 def reward_logs_page():
@@ -3,12 +3,23 @@ import json, os
 from utils.timeutils import gmt4_now
 from werkzeug.utils import secure_filename
 from utils.logging import log_event
-from apscheduler.schedulers.background import BackgroundScheduler
+from utils.storage import BACKUP_MODE
+from utils import backup_store
 
 subscription_routes = Blueprint("subscription_routes", __name__)
 SUB_PATH = "subscriptions.json"
 BACKUP_DIR = "data/subscription_backups"
 os.makedirs(BACKUP_DIR, exist_ok=True)
+backup_store.register_folder(BACKUP_DIR)
+
+
+def _write_backup(backup_path, content: str):
+    """Save a subscriptions backup, as a chunk manifest when SCORES_BACKUP_MODE=cas."""
+    if BACKUP_MODE == "cas":
+        backup_store.write_manifest(backup_path, backup_store.put_bytes(content.encode("utf-8")))
+    else:
+        with open(backup_path, "w") as bkp:
+            bkp.write(content)
 
 
 def auto_backup_subscriptions():
@@ -22,9 +33,8 @@ def auto_backup_subscriptions():
 
         with open(SUB_PATH, "r") as f:
             content = f.read()
-            json.loads(content)  # Validate
-            with open(backup_path, "w") as bkp:
-                bkp.write(content)
+        json.loads(content)  # Validate
+        _write_backup(backup_path, content)
 
         log_event(f"✅ subscriptions.json auto-backed up as {backup_path}")
 
@@ -163,8 +173,7 @@ def upload_subscription_backup():
             timestamp = gmt4_now().strftime("%Y%m%d-%H%M%S")
             backup_path = os.path.join(BACKUP_DIR, f"auto_{timestamp}.json")
             with open(SUB_PATH, "r") as old:
-                with open(backup_path, "w") as bkp:
-                    bkp.write(old.read())
+                _write_backup(backup_path, old.read())
             log_event(f"📦 Backup created before manual subscription upload: {backup_path}")
 
         # Save new version
@@ -191,16 +200,15 @@ def restore_backup():
         return jsonify({"error": "Backup not found"}), 404
 
     try:
-        with open(path, "r") as f:
-            parsed = json.load(f)
+        parsed = json.loads(backup_store.read_file(path))
         if not isinstance(parsed, dict):
             raise ValueError("Backup file is not a valid dict")
 
         # Backup current before restoring
         if os.path.exists(SUB_PATH):
             timestamp = gmt4_now().strftime("%Y%m%d-%H%M%S")
-            with open(SUB_PATH, "r") as cur, open(os.path.join(BACKUP_DIR, f"auto_before_restore_{timestamp}.json"), "w") as bkp:
-                bkp.write(cur.read())
+            with open(SUB_PATH, "r") as cur:
+                _write_backup(os.path.join(BACKUP_DIR, f"auto_before_restore_{timestamp}.json"), cur.read())
 
         # Restore
         with open(SUB_PATH, "w") as f:
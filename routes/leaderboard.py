@@ -1,6 +1,18 @@
-from flask import Blueprint, request, jsonify, render_template
-from utils.storage import load_scores
+import os
+import json
+import time
+import base64
+from datetime import datetime, timezone
+from functools import wraps
+from flask import Blueprint, request, jsonify, render_template, make_response, Response, g
+from markupsafe import escape
+from utils.storage import (
+    get_scores, get_rank, get_user, leaderboard_snapshot, leaderboard_position, data_version,
+    window_board, get_window_rank, get_ranks,
+)
+from utils.windows import WINDOWS, period_keys
 from utils.logging import log_event
+from utils import broadcast
 from routes.rewards import log_reward_event, _load as load_reward_ledger
 
 leaderboard_routes = Blueprint("leaderboard_routes", __name__)
@@ -9,86 +21,312 @@ MAINTENANCE_MODE = False
 ENABLE_REWARD_ISSUING = False
 LEADERBOARD_ENABLED = True  # 🔒 Set to True to unlock leaderboard for all users
 
+# Changes with the template on deploy, so a cached page is not kept across releases
+_PAGE_STAMP = f"{os.stat(os.path.join(os.path.dirname(__file__), '..', 'templates', 'leaderboard.html')).st_mtime_ns:x}"
+
+
+def conditional(salt=""):
+    """Add ETag/Last-Modified from the shared data version and answer a
+    matching If-None-Match with 304 before the view touches the store.
+
+    salt is mixed into the ETag; pass a callable for per-request values.
+    A view serving the debounced snapshot sets g.data_version to the
+    version its body was built from; if that is not the current one, the
+    ETag names the body's version and Last-Modified is left out, so the
+    next revalidation gets the refreshed body instead of a 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version, changed_at = data_version()
+            extra = salt() if callable(salt) else salt
+            tag = lambda v: f"{v}-{extra}" if extra else v
+            if request.if_none_match.contains_weak(tag(version)):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body_version = g.pop("data_version", version)
+                if body_version != version:
+                    if body_version is not None:
+                        response.set_etag(tag(body_version))
+                    response.cache_control.no_cache = True
+                    return response
+            response.set_etag(tag(version))
+            response.last_modified = datetime.fromtimestamp(changed_at, timezone.utc)
+            response.cache_control.no_cache = True  # always revalidate; a 304 is nearly free
+            return response
+        return wrapper
+    return decorator
+
+
+def _window_salt():
+    """A window's rankings change when its period rolls over, not only on writes."""
+    window = request.args.get("window")
+    return period_keys(time.time())[window] if window in WINDOWS else ""
+
+
+def _window_arg():
+    """The ?window= argument (None for all-time); ValueError if unknown."""
+    window = request.args.get("window") or None
+    if window is not None and window not in WINDOWS:
+        raise ValueError(f"window must be one of {', '.join(WINDOWS)}")
+    return window
+
+
 @leaderboard_routes.route("/leaderboard-status")
 def leaderboard_status():
     return jsonify({"enabled": LEADERBOARD_ENABLED})
 
 
+_page_cache = (None, "")  # (leaderboard version, page rendered without a highlighted user)
+
+
+def _render_board(board):
+    """The page as everyone sees it; rendered once per leaderboard version."""
+    global _page_cache
+    version, html = _page_cache
+    if version == board.version:
+        return html
+    # The template shows the top 50 only
+    sorted_scores = [
+        {"user_id": uid, "display_name": name, "score": score}
+        for uid, name, score in board.page(0, 50)
+    ]
+    html = render_template(
+        "leaderboard.html",
+        scores=sorted_scores,
+        current_user_id=None,
+        total_players=len(get_scores()),
+        top_first=sorted_scores[0] if len(sorted_scores) > 0 else None,
+        top_second=sorted_scores[1] if len(sorted_scores) > 1 else None,
+        top_third=sorted_scores[2] if len(sorted_scores) > 2 else None,
+    )
+    _page_cache = (board.version, html)
+    return html
+
+
 @leaderboard_routes.route("/leaderboard-page")
+@conditional(salt=_PAGE_STAMP)
 def leaderboard_page():
     try:
-        scores = load_scores()
-        filtered = [s for s in scores if s.get("score", 0) > 0]
-        sorted_scores = sorted(filtered, key=lambda x: x["score"], reverse=True)
+        board = leaderboard_snapshot()
+        g.data_version = board.data_version
+        html = _render_board(board)
         current_uid = request.args.get("user_id", "")
-        total_players = len(scores)
-
-        for e in sorted_scores:
-            e["display_name"] = e.get("first_name") or e.get("last_name") or e.get("username") or "Anonymous"
-
-        user_index = next((i for i, e in enumerate(sorted_scores) if e.get("user_id") == current_uid), None)
-        user_rank = user_index + 1 if user_index is not None else None
-        user_score = sorted_scores[user_index]["score"] if user_index is not None else 0
-
-        top_first = sorted_scores[0] if len(sorted_scores) > 0 else None
-        top_second = sorted_scores[1] if len(sorted_scores) > 1 else None
-        top_third = sorted_scores[2] if len(sorted_scores) > 2 else None
-
-        return render_template(
-            "leaderboard.html",
-            scores=sorted_scores,
-            current_user_id=current_uid,
-            total_players=total_players,
-            user_rank=user_rank,
-            top_first=top_first,
-            top_second=top_second,
-            top_third=top_third,
-        )
+        if current_uid:
+            # Highlight the caller's row in the shared render (a no-op outside the top 50)
+            row = f'<tr class="" data-user="{escape(current_uid)}">'
+            html = html.replace(row, f'<tr class="me" data-user="{escape(current_uid)}">', 1)
+        return html
 
     except Exception as e:
         log_event(f"❌ Leaderboard crash: {e}")
         return "<h2>🚧 Leaderboard under maintenance</h2>", 500
 
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 500
+LIST_MAX_RADIUS = 100
+ROW_FIELDS = ("user_id", "display_name", "score")  # served straight from snapshot rows
+HIDDEN_FIELDS = ("windows",)  # internal bookkeeping, never served
+
+
+def _encode_cursor(key):
+    neg_score, seq, uid = key
+    return base64.urlsafe_b64encode(f"{-neg_score}:{seq}:{uid}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    score, seq, uid = raw.split(":", 2)
+    return (-int(score), int(seq), uid)
+
+
+def _bounded_int(name, default, low, high):
+    value = int(request.args.get(name, default))
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+
 @leaderboard_routes.route("/leaderboard-list")
+@conditional(salt=_window_salt)
 def get_leaderboard_list():
+    """One page of the leaderboard.
+
+    ?limit= (default 100) with ?offset= or an opaque ?cursor= from the
+    X-Next-Cursor header; or ?around=<user_id>&radius=N for the rows
+    around a user. ?fields=user_id,score,... projects each row (entry
+    fields, display_name or rank); without it rows are full entries plus
+    rank. ?window=hourly|daily|weekly|season ranks points gained in the
+    current period instead. Costs O(log n + page size).
+    """
     try:
-        scores = load_scores()
-        filtered = [s for s in scores if s.get("score", 0) > 0]
-        sorted_scores = sorted(filtered, key=lambda x: x["score"], reverse=True)
-        return jsonify(sorted_scores)
+        try:
+            window = _window_arg()
+            if window:
+                board = window_board(window)  # live, as fresh as the data version
+            else:
+                board = leaderboard_snapshot()
+                g.data_version = board.data_version
+            if request.args.get("around"):
+                radius = _bounded_int("radius", 5, 0, LIST_MAX_RADIUS)
+                pos = leaderboard_position(board, request.args["around"])
+                if pos is None:
+                    return jsonify([])
+                start, stop = max(0, pos - radius), pos + radius + 1
+            else:
+                limit = _bounded_int("limit", LIST_DEFAULT_LIMIT, 1, LIST_MAX_LIMIT)
+                if request.args.get("cursor"):
+                    start = board.index_after(_decode_cursor(request.args["cursor"]))
+                else:
+                    start = _bounded_int("offset", 0, 0, 1 << 62)
+                stop = start + limit
+        except (ValueError, UnicodeDecodeError) as e:
+            return jsonify({"error": f"Invalid pagination parameters: {e}"}), 400
+
+        rows = board.page(start, stop)
+        fields = [f for f in request.args.get("fields", "").split(",") if f]
+        if fields and all(f in ROW_FIELDS or f == "rank" for f in fields):
+            items = [
+                {f: start + i + 1 if f == "rank" else row[ROW_FIELDS.index(f)] for f in fields}
+                for i, row in enumerate(rows)
+            ]
+        else:
+            items = []
+            for i, (uid, name, score) in enumerate(rows):
+                entry = get_user(uid) or {"user_id": uid, "score": score}
+                item = {k: v for k, v in entry.items() if k not in HIDDEN_FIELDS}
+                item.update(display_name=name, rank=start + i + 1)
+                items.append({f: item.get(f) for f in fields} if fields else item)
+
+        response = jsonify(items)
+        response.headers["X-Total-Count"] = str(len(board))
+        response.headers["X-Leaderboard-Version"] = str(board.version)
+        if stop < len(board) and rows:
+            response.headers["X-Next-Cursor"] = _encode_cursor(board.key_at(start + len(rows) - 1))
+        return response
     except Exception as e:
         log_event(f"❌ Error in /leaderboard-list: {e}")
         return jsonify({"error": "Leaderboard list fetch failed"}), 500
 
 
+def _summary(user_id, ranked):
+    user_rank = ranked["rank"] if ranked else None
+    user_score = ranked["score"] if ranked else 0
+    punch_gap = 0
+
+    if ranked and ranked["next_score"] is not None:
+        punch_gap = max(0, ranked["next_score"] - user_score)
+
+    return {
+        "user_id": user_id,
+        "rank": user_rank,
+        "score": user_score,
+        "punches_to_next_rank": punch_gap
+    }
+
+
+def rank_summary(user_id, window=None):
+    """Rank, score and punches to the next rank, as served by /leaderboard.
+
+    With a window, score is the points gained in its current period.
+    """
+    return _summary(user_id, get_window_rank(window, user_id) if window else get_rank(user_id))
+
+
 @leaderboard_routes.route("/leaderboard")
+@conditional(salt=_window_salt)
 def get_leaderboard_data():
     try:
-        scores = load_scores()
-        user_id = request.args.get("user_id", "")
-        filtered = [s for s in scores if s.get("score", 0) > 0]
-        sorted_scores = sorted(filtered, key=lambda x: x["score"], reverse=True)
+        try:
+            window = _window_arg()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        summary = rank_summary(request.args.get("user_id", ""), window)
+        if window:
+            summary["window"] = window
+            summary["period"] = period_keys(time.time())[window]
+        return jsonify(summary)
 
-        user_index = next((i for i, s in enumerate(sorted_scores) if s.get("user_id") == user_id), None)
-        user_rank = user_index + 1 if user_index is not None else None
-        user_score = sorted_scores[user_index]["score"] if user_index is not None else 0
+    except Exception as e:
+        log_event(f"❌ Error in /leaderboard JSON: {e}")
+        return jsonify({"error": "Leaderboard fetch failed"}), 500
 
-        next_score = None
-        punch_gap = 0
 
-        if user_index is not None and user_index > 0:
-            next_score = sorted_scores[user_index - 1]["score"]
-            punch_gap = max(0, next_score - user_score)
+BATCH_MAX_IDS = 10000
 
-        response = {
-            "user_id": user_id,
-            "rank": user_rank,
-            "score": user_score,
-            "punches_to_next_rank": punch_gap
-        }
 
-        return jsonify(response)
+@leaderboard_routes.route("/leaderboard/batch", methods=["POST"])
+def get_leaderboard_batch():
+    """/leaderboard for many users at once: {"user_ids": [...], "window": optional}.
 
+    All results come from the same leaderboard state, one O(log n) lookup
+    per id; results follow the request order.
+    """
+    data = request.get_json(silent=True) or {}
+    user_ids = data.get("user_ids")
+    if not isinstance(user_ids, list) or not all(isinstance(u, (str, int)) for u in user_ids):
+        return jsonify({"error": "user_ids must be a list of ids"}), 400
+    if len(user_ids) > BATCH_MAX_IDS:
+        return jsonify({"error": f"At most {BATCH_MAX_IDS} user_ids per request"}), 400
+    window = data.get("window") or None
+    if window is not None and window not in WINDOWS:
+        return jsonify({"error": f"window must be one of {', '.join(WINDOWS)}"}), 400
+    try:
+        user_ids = [str(u) for u in user_ids]
+        ranked, version = get_ranks(user_ids, window)
+        response = jsonify({
+            "results": [_summary(uid, r) for uid, r in zip(user_ids, ranked)],
+            **({"window": window, "period": period_keys(time.time())[window]} if window else {}),
+        })
+        response.headers["X-Leaderboard-Version"] = str(version)
+        return response
     except Exception as e:
-        log_event(f"❌ Error in /leaderboard JSON: {e}")
-        return jsonify({"error": "Leaderboard fetch failed"}), 500
+        log_event(f"❌ Error in /leaderboard/batch: {e}")
+        return jsonify({"error": "Batch rank lookup failed"}), 500
+
+
+SSE_MAX_RATE = float(os.getenv("SSE_MAX_RATE", "1"))   # events per second per connection
+SSE_HEARTBEAT = 15      # seconds of silence before a keep-alive comment
+SSE_LIFETIME = 300      # seconds before the server ends a stream; EventSource reconnects
+
+
+@leaderboard_routes.route("/leaderboard/stream")
+def leaderboard_stream():
+    """Server-sent "rank" events for ?user_id=, sent only when the caller's
+    rank, score or gap changes and at most ?rate= (<= SSE_MAX_RATE) per second."""
+    user_id = request.args.get("user_id", "")
+    if not user_id:
+        return jsonify({"error": "user_id required"}), 400
+    try:
+        rate = min(float(request.args.get("rate", SSE_MAX_RATE)), SSE_MAX_RATE)
+        if rate <= 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "rate must be a positive number"}), 400
+    if not broadcast.acquire():
+        return jsonify({"error": "Too many open streams, retry later"}), 503, {"Retry-After": "30"}
+
+    def events():
+        yield "retry: 5000\n\n"
+        last = None
+        deadline = time.time() + SSE_LIFETIME
+        while time.time() < deadline:
+            seen = broadcast.current()
+            summary = rank_summary(user_id)
+            if summary != last:
+                yield f"event: rank\ndata: {json.dumps(summary)}\n\n"
+                last = summary
+                time.sleep(1 / rate)  # coalesce: changes during the pause become one event
+            if broadcast.wait(seen, SSE_HEARTBEAT) == seen:
+                yield ": keep-alive\n\n"
+
+    response = Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(broadcast.release)  # runs on disconnect, even if never iterated
+    return response
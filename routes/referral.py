@@ -1,5 +1,6 @@
+from collections import Counter
 from flask import Blueprint, request, jsonify, render_template_string
-from utils.storage import load_scores
+from utils.storage import iter_scores, get_user
 
 referral_routes = Blueprint("referral_routes", __name__)
 
@@ -9,8 +10,7 @@ def referral_history():
     if not user_id:
         return jsonify({"error": "Missing user ID"}), 400
 
-    scores = load_scores()
-    user = next((e for e in scores if e["user_id"] == user_id), None)
+    user = get_user(user_id)
 
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -20,10 +20,9 @@ def referral_history():
 
 @referral_routes.route("/referral-history-table")
 def referral_history_table():
-    scores = load_scores()
     all_referrals = []
 
-    for user in scores:
+    for user in iter_scores():
         referrer = user.get("username", "Unknown")
         referrals = user.get("referrals", [])
         for ref in referrals:
@@ -100,15 +99,15 @@ def referral_history_table():
 
 @referral_routes.route("/user-logs")
 def user_logs():
-    scores = load_scores()
     logs = []
+    sent_by = Counter(u.get("referred_by") for u in iter_scores())
 
-    for user in scores:
+    for user in iter_scores():
         logs.append({
             "username": user.get("username", "Anonymous"),
             "user_id": user.get("user_id", ""),
             "punches": user.get("score", 0),
-            "referrals_sent": len([u for u in scores if u.get("referred_by") == user.get("user_id")]),
+            "referrals_sent": sent_by[user.get("user_id")],
             "referrals_accepted": len(user.get("referrals", [])),
             "registered": user.get("registered_at", "N/A")
         })
@@ -176,4 +175,4 @@ def user_logs():
     </html>
     """
 
-    return render_template_string(html, logs=logs, total=len(scores))
+    return render_template_string(html, logs=logs, total=len(logs))
@@ -12,9 +12,10 @@ from flask import Blueprint, request, jsonify, session
 from utils.logging import log_event  # ✅ Logging to logs.txt
 from utils import user_log_info
 from utils import gmt4_timestamp
+from utils.paths import DATA_DIR
 
 rewards_bp = Blueprint("rewards", __name__)
-REWARDS_FILE = "/app/data/rewards.json"
+REWARDS_FILE = os.path.join(DATA_DIR, "rewards.json")
 
 # ---------- Ensure rewards.json exists ----------------------------------- #
 def ensure_rewards_file():
@@ -10,7 +10,7 @@
 """
 
 from flask import Blueprint, request, jsonify
-from utils.storage import load_scores, save_scores
+from utils.storage import get_user, save_entries, scores_lock
 from utils.logging import log_event
 from utils import normalize_username, user_log_info
 from routes.rewards import log_reward_event  # NEW
@@ -31,12 +31,11 @@ TASK_DEFINITIONS = {
 }
 
 # --------------------------------------------------------------------------
-def _get_user_entry(user_id: str, scores: list[dict]) -> dict | None:
-    for e in scores:
-        if e.get("user_id") == user_id:
-            e.setdefault("tasks_done", [])
-            return e
-    return None
+def _get_user_entry(user_id: str) -> dict | None:
+    e = get_user(user_id)
+    if e is not None:
+        e.setdefault("tasks_done", [])
+    return e
 
 # === GET /tasks ===========================================================
 @tasks_routes.route("/tasks", methods=["GET"])
@@ -46,8 +45,7 @@ def list_tasks():
     if not user_id:
         return jsonify({"error": "user_id query param required"}), 400
 
-    scores = load_scores()
-    entry = _get_user_entry(user_id, scores)
+    entry = _get_user_entry(user_id)
     done = set(entry["tasks_done"]) if entry else set()
 
     return jsonify([
@@ -70,25 +68,25 @@ def complete_task():
     if not user_id or task_id not in TASK_DEFINITIONS:
         return jsonify({"error": "invalid user_id or task_id"}), 400
 
-    scores = load_scores()
-    user = _get_user_entry(user_id, scores)
-    if not user:
-        return jsonify({"error": "user not registered"}), 404
+    with scores_lock():
+        user = _get_user_entry(user_id)
+        if not user:
+            return jsonify({"error": "user not registered"}), 404
 
-    username = normalize_username(user.get("username"))
-    user_desc = user_log_info(username, user.get("first_name", ""), user.get("last_name", ""))
+        username = normalize_username(user.get("username"))
+        user_desc = user_log_info(username, user.get("first_name", ""), user.get("last_name", ""))
 
-    if task_id in user["tasks_done"]:
-        return jsonify({"status": "already_completed"})
+        if task_id in user["tasks_done"]:
+            return jsonify({"status": "already_completed"})
 
-    # --- apply reward ---------------------------------------------------- #
-    reward = TASK_DEFINITIONS[task_id]["reward"]
-    prev = user.get("score", 0)
-    new = prev + reward
+        # --- apply reward ---------------------------------------------------- #
+        reward = TASK_DEFINITIONS[task_id]["reward"]
+        prev = user.get("score", 0)
+        new = prev + reward
 
-    user["tasks_done"].append(task_id)
-    user["score"] = new
-    save_scores(scores)
+        user["tasks_done"].append(task_id)
+        user["score"] = new
+        save_entries("task", user)
 
     # --- diagnostic log before reward logging ---------------------------- #
     log_event(f"📡 REACHED log_reward_event for user {user_desc} (ID: {user_id}), task {task_id}")
@@ -1,9 +1,9 @@
 from flask import Blueprint, request, jsonify
-from utils.storage import load_scores, save_scores, backup_scores
+from utils.storage import get_user, add_user, save_entries, backup_scores, scores_lock
 from utils.logging import log_event
+from utils.activity import record_tap
 from utils import normalize_username, user_log_info, gmt4_timestamp
 import datetime
-from collections import defaultdict, deque
 import time
 from routes.debug_tools.subscriptions import load_subscriptions, save_subscriptions
 
@@ -18,39 +18,35 @@ def register():
     user_id = str(data.get("user_id", "")).strip()
     referrer_id = str(data.get("referrer_id", "")).strip()
 
-    scores = load_scores()
-    for entry in scores:
-        if entry.get("user_id") == user_id:
+    with scores_lock():
+        if get_user(user_id) is not None:
             return jsonify({"status": "already_registered"})
 
-    new_user = {
-        "username": username,
-        "first_name": first_name,
-        "last_name": last_name,
-        "user_id": user_id,
-        "score": 0,
-        "registered_at": gmt4_timestamp()
-    }
+        new_user = {
+            "username": username,
+            "first_name": first_name,
+            "last_name": last_name,
+            "user_id": user_id,
+            "score": 0,
+            "registered_at": gmt4_timestamp()
+        }
 
-    user_desc = user_log_info(username, first_name, last_name)
+        user_desc = user_log_info(username, first_name, last_name)
 
-    if referrer_id:
-        new_user["referred_by"] = referrer_id
-        log_event(f"🧾 {user_desc} was referred by {referrer_id}")
+        if referrer_id:
+            new_user["referred_by"] = referrer_id
+            log_event(f"🧾 {user_desc} was referred by {referrer_id}")
 
-    log_event(f"📝 Registered new user: {user_desc} (ID: {user_id})")
+        log_event(f"📝 Registered new user: {user_desc} (ID: {user_id})")
 
-    log_event(f"📝 Registered new user: {username} ({user_id})")
+        log_event(f"📝 Registered new user: {username} ({user_id})")
 
-    scores.append(new_user)
-    save_scores(scores)
+        add_user(new_user)
+        save_entries("register", new_user)
     backup_scores()
     return jsonify({"status": "registered"})
 
 
-submission_times = {}  # Tracks last submission time per user
-user_activity = defaultdict(lambda: deque(maxlen=50))  # Store recent taps
-
 @user_routes.route("/submit", methods=["POST"])
 def submit():
     data = request.get_json(force=True)
@@ -64,9 +60,8 @@ def submit():
 
     now = time.time()
 
-    # === Bot Detection ===
-    last_time = submission_times.get(user_id)
-    submission_times[user_id] = now
+    # === Bot Detection (tap history is shared across workers) ===
+    last_time, recent_taps = record_tap(user_id, now)
     if last_time:
         interval = now - last_time
         if interval < 0.2:
@@ -74,26 +69,25 @@ def submit():
                 f"⚠️ Suspiciously fast tap: {user_desc} (ID: {user_id}) – {interval:.3f}s"
             )
 
-    user_activity[user_id].append(now)
-    recent_taps = [t for t in user_activity[user_id] if now - t <= 10]
-    if len(recent_taps) > 30:
+    if recent_taps > 30:
         log_event(
-            f"🚨 High-frequency activity: {user_desc} (ID: {user_id}) – {len(recent_taps)} taps in 10s"
+            f"🚨 High-frequency activity: {user_desc} (ID: {user_id}) – {recent_taps} taps in 10s"
         )
 
-    scores = load_scores()
-    updated = False
-    entry = None
+    with scores_lock():
+        updated = False
+        changed = []  # entries to journal
+        op = "score"
 
-    for e in scores:
-        if e.get("user_id") == user_id:
-            entry = e
+        entry = get_user(user_id)
+        if entry is not None:
             old_score = entry["score"]
             if score > old_score or abs(score - old_score) > 5:
                 entry["score"] = score
                 entry["username"] = username
                 entry["first_name"] = first_name
                 entry["last_name"] = last_name
+                changed.append(entry)
 
                 # 🎯 Bonus for 100s milestone
                 if score % 100 == 0:
@@ -105,8 +99,7 @@ def submit():
                 # 🎁 Referral reward
                 referrer_id = entry.get("referred_by")
                 if old_score < 20 <= score and referrer_id and not entry.get("referral_reward_issued"):
-                    referrer_index = next((i for i, e in enumerate(scores) if e.get("user_id") == referrer_id), None)
-                    referrer = scores[referrer_index] if referrer_index is not None else None
+                    referrer = get_user(referrer_id)
                     if referrer:
                         reward = 10000
                         referrer_old = referrer["score"]
@@ -122,6 +115,8 @@ def submit():
                             entry["referral_reward_issued"] = True
                             entry["referral_reward_time"] = gmt4_timestamp()
                             updated = True
+                            changed.append(referrer)
+                            op = "referral"
 
                             if "referrals" not in referrer:
                                 referrer["referrals"] = []
@@ -155,33 +150,32 @@ def submit():
                                 f"⛔ Duplicate referral ignored: {referrer_desc} already rewarded for referring {user_desc}"
                             )
 
-                        # ✅ Reassign updated referrer to ensure persistence
-                        scores[referrer_index] = referrer
-
                 log_event(
                     f"✅ Updated score for {user_desc} (ID: {user_id}) to {entry['score']}"
                 )
             updated = True
-            break
 
-    if not updated:
-        entry = {
-            "username": username,
-            "first_name": first_name,
-            "last_name": last_name,
-            "user_id": user_id,
-            "score": score,
-            "registered_at": gmt4_timestamp()
-        }
-        scores.append(entry)
-        log_event(
-            f"🆕 New user added: {user_desc} (ID: {user_id}) with score {score}"
-        )
+        if not updated:
+            entry = {
+                "username": username,
+                "first_name": first_name,
+                "last_name": last_name,
+                "user_id": user_id,
+                "score": score,
+                "registered_at": gmt4_timestamp()
+            }
+            add_user(entry)
+            changed.append(entry)
+            op = "register"
+            log_event(
+                f"🆕 New user added: {user_desc} (ID: {user_id}) with score {score}"
+            )
 
-    try:
-        save_scores(scores)
-    except Exception as e:
-        log_event(f"❌ Failed to save updated scores after submit: {e}")
+        try:
+            if changed:
+                save_entries(op, *changed)
+        except Exception as e:
+            log_event(f"❌ Failed to save updated scores after submit: {e}")
 
     return jsonify({
         "status": "ok",
@@ -194,8 +188,7 @@ def profile():
     if not user_id:
         return jsonify({"error": "Missing user ID"}), 400
 
-    scores = load_scores()
-    entry = next((e for e in scores if e["user_id"] == user_id), None)
+    entry = get_user(user_id)
 
     if not entry:
         return jsonify({"error": "User not found"}), 404
@@ -215,13 +208,13 @@ def subscribe_notifications():
     user_id = str(data.get("user_id", "")).strip()
     username = normalize_username(data.get("username"))
 
-    scores = load_scores()
-    user = next((e for e in scores if e["user_id"] == user_id), None)
-    if not user:
-        return jsonify({"error": "User not found"}), 404
+    with scores_lock():
+        user = get_user(user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
 
-    user["subscribed_notifications"] = True
-    save_scores(scores)
+        user["subscribed_notifications"] = True
+        save_entries("subscription", user)
 
     subs = load_subscriptions()
     subs[user_id] = {
@@ -242,13 +235,13 @@ def unsubscribe_notifications():
     data = request.get_json(force=True)
     user_id = str(data.get("user_id", "")).strip()
 
-    scores = load_scores()
-    user = next((e for e in scores if e["user_id"] == user_id), None)
-    if not user:
-        return jsonify({"error": "User not found"}), 404
+    with scores_lock():
+        user = get_user(user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
 
-    user["subscribed_notifications"] = False
-    save_scores(scores)
+        user["subscribed_notifications"] = False
+        save_entries("subscription", user)
 
     subs = load_subscriptions()
     subs[user_id] = {
@@ -266,8 +259,7 @@ def unsubscribe_notifications():
 @user_routes.route("/notifications/status", methods=["GET"])
 def check_notification_status():
     user_id = request.args.get("user_id", "").strip()
-    scores = load_scores()
-    user = next((e for e in scores if e["user_id"] == user_id), None)
+    user = get_user(user_id)
 
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -0,0 +1,154 @@
+# tests/test_coherence.py
+"""
+Multi-process coherence on one box: forked workers sharing a data directory.
+
+Each scenario runs in a freshly spawned process, since DATA_DIR and
+SCORES_BACKEND are read at import. That process loads the store like a
+preloaded gunicorn master, then forks the workers.
+
+    python -m pytest -q tests/test_coherence.py
+"""
+import os
+import sys
+import multiprocessing as mp
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKERS = 4
+ROUNDS = 40
+TAPS = 200
+TIMEOUT = 120
+
+
+def _spawn(scenario):
+    """Run scenario(results) in a fresh interpreter; return its reports by worker."""
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=scenario, args=(results,))
+    proc.start()
+    reports = {}
+    while True:
+        report = results.get(timeout=TIMEOUT)
+        if report == "done":
+            break
+        reports[report.pop("worker")] = report
+    proc.join(TIMEOUT)
+    assert proc.exitcode == 0
+    return reports
+
+
+def _fork_workers(target, *args):
+    """Run target(worker id, *args) in WORKERS forked processes; return their exit codes."""
+    ctx = mp.get_context("fork")
+    procs = [ctx.Process(target=target, args=(wid, *args)) for wid in range(WORKERS)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(TIMEOUT)
+    return [p.exitcode for p in procs]
+
+
+# ----- Score store -----
+
+def _score_worker(wid, barrier, results):
+    from utils import storage
+    for i in range(ROUNDS):
+        # Read-modify-write of a user every worker touches
+        with storage.scores_lock():
+            shared = storage.get_user("shared")
+            shared["score"] += 1
+            storage.save_entries("score", shared)
+        uid = f"w{wid}-{i}"
+        with storage.scores_lock():
+            storage.add_user({"user_id": uid, "score": i + 1})
+            storage.save_entries("register", storage.get_user(uid))
+        if i % 10 == wid:
+            storage.flush_scores(force=True)  # compact while the others keep writing
+    barrier.wait()
+    results.put({
+        "worker": wid,
+        "users": len(storage.get_scores()),
+        "shared": storage.get_user("shared")["score"],
+        "rank": storage.get_rank("shared"),
+        "last_users": [bool(storage.get_user(f"w{w}-{ROUNDS - 1}")) for w in range(WORKERS)],
+    })
+
+
+def _score_scenario(results):
+    from utils import storage
+    from utils.logging import LOG_FILE
+    storage.init_score_store()
+    storage.replace_scores([{"user_id": "shared", "score": 0}])
+    storage.get_scores()
+    barrier = mp.get_context("fork").Barrier(WORKERS)
+    exitcodes = _fork_workers(_score_worker, barrier, results)
+
+    # The preloaded parent catches up without having written anything since
+    with open(LOG_FILE) as f:
+        reloads = f.read().count("Reloaded")
+    results.put({
+        "worker": "parent",
+        "exitcodes": exitcodes,
+        "users": len(storage.get_scores()),
+        "shared": storage.get_user("shared")["score"],
+        "on_disk": len(storage.load_scores()),
+        "reloads": reloads,
+    })
+    results.put("done")
+
+
+@pytest.mark.parametrize("backend", ["json", "sharded", "sqlite"])
+def test_workers_share_one_consistent_store(tmp_path, monkeypatch, backend):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("SCORES_BACKEND", backend)
+    reports = _spawn(_score_scenario)
+    users, total = 1 + WORKERS * ROUNDS, WORKERS * ROUNDS
+
+    parent = reports["parent"]
+    assert parent["exitcodes"] == [0] * WORKERS
+    assert parent["users"] == users
+    assert parent["shared"] == total  # no lost increments
+    assert parent["on_disk"] == users
+    assert parent["reloads"] == 0  # compactions are followed through the journal
+
+    for wid in range(WORKERS):
+        report = reports[wid]
+        assert report["users"] == users
+        assert report["shared"] == total
+        assert report["rank"] == {"rank": 1, "score": total, "next_score": None}
+        assert report["last_users"] == [True] * WORKERS
+
+
+# ----- Tap activity table -----
+
+def _tap_worker(wid, barrier, results):
+    from utils import activity
+    for _ in range(TAPS):
+        activity.record_tap("shared", 1000.0)
+    activity.record_tap(f"w{wid}", 1000.0 + wid)
+    barrier.wait()
+    # The neighbour's tap, recorded by another process, is visible here
+    neighbour = (wid + 1) % WORKERS
+    results.put({"worker": wid, "neighbour_last": activity.record_tap(f"w{neighbour}", 1005.0)[0]})
+
+
+def _tap_scenario(results):
+    from utils import activity
+    barrier = mp.get_context("fork").Barrier(WORKERS)
+    exitcodes = _fork_workers(_tap_worker, barrier, results)
+    last, count = activity.record_tap("shared", 1000.0)
+    results.put({"worker": "parent", "exitcodes": exitcodes, "last": last, "count": count})
+    results.put("done")
+
+
+def test_tap_activity_is_shared_between_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    reports = _spawn(_tap_scenario)
+
+    parent = reports["parent"]
+    assert parent["exitcodes"] == [0] * WORKERS
+    assert parent["last"] == 1000.0
+    assert parent["count"] == WORKERS * TAPS + 1  # every worker's taps, none lost
+    for wid in range(WORKERS):
+        assert reports[wid]["neighbour_last"] == 1000.0 + (wid + 1) % WORKERS
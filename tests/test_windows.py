@@ -0,0 +1,46 @@
+# tests/test_windows.py
+"""
+Time-window rankings as served over HTTP.
+
+Each scenario runs in a freshly spawned process, since DATA_DIR is read at
+import.
+
+    python -m pytest -q tests/test_windows.py
+"""
+import os
+import sys
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TIMEOUT = 60
+
+
+def _spawn(scenario):
+    """Run scenario(results) in a fresh interpreter and return what it reported."""
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=scenario, args=(results,))
+    proc.start()
+    report = results.get(timeout=TIMEOUT)
+    proc.join(TIMEOUT)
+    assert proc.exitcode == 0
+    return report
+
+
+def _first_submit_scenario(results):
+    from main import app
+    client = app.test_client()
+    client.post("/submit", json={"user_id": "new", "username": "new", "score": 33})
+    daily = client.get("/leaderboard?user_id=new&window=daily").get_json()
+    rows = client.get("/leaderboard-list").get_json()
+    results.put({"daily": daily, "row_keys": sorted(rows[0])})
+
+
+def test_first_submit_is_credited_to_every_window(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    report = _spawn(_first_submit_scenario)
+
+    assert report["daily"]["rank"] == 1
+    assert report["daily"]["score"] == 33
+    assert "windows" not in report["row_keys"]  # internal buckets are not served
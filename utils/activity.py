@@ -0,0 +1,89 @@
+# utils/activity.py
+"""
+Per-user tap tracking for bot detection, shared by every worker process.
+
+A fixed table of slots lives in a memory-mapped file; each slot holds a
+user's last tap time and a two-bucket sliding window of tap counts. Slots
+are found by hashing the user_id with short linear probing, and when every
+probed slot is taken the stalest one is recycled — so the table never grows
+and a forgotten idle user costs nothing.
+"""
+import os
+import mmap
+import fcntl
+import struct
+import hashlib
+import threading
+from .paths import DATA_DIR
+
+ACTIVITY_FILE = os.path.join(DATA_DIR, ".tap_activity")
+ACTIVITY_SLOTS = int(os.getenv("TAP_ACTIVITY_SLOTS", "65536"))
+WINDOW = 10.0   # seconds covered by the tap count
+_PROBES = 8
+
+_SLOT = struct.Struct("<QddII")  # key, last tap, window start, count, previous window count
+
+_init_lock = threading.Lock()
+_map = None
+_fd = None
+_pid = None
+
+
+def _table():
+    global _map, _fd, _pid
+    if _map is None or _pid != os.getpid():
+        with _init_lock:
+            if _map is None or _pid != os.getpid():
+                # Own descriptor per process: flock is shared across a fork
+                os.makedirs(os.path.dirname(ACTIVITY_FILE), exist_ok=True)
+                _fd = os.open(ACTIVITY_FILE, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+                size = ACTIVITY_SLOTS * _SLOT.size
+                if os.fstat(_fd).st_size != size:
+                    os.ftruncate(_fd, size)  # first start or slot count changed
+                _map = mmap.mmap(_fd, size)
+                _pid = os.getpid()
+    return _map
+
+
+def _key(user_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(user_id.encode(), digest_size=8).digest(), "little") or 1
+
+
+def record_tap(user_id: str, now: float) -> tuple[float | None, int]:
+    """Record a tap; return the previous tap time and taps in the last WINDOW seconds."""
+    table = _table()
+    key = _key(user_id)
+    home = key % ACTIVITY_SLOTS
+
+    fcntl.flock(_fd, fcntl.LOCK_EX)
+    try:
+        slot, stalest, stalest_time = None, None, None
+        for probe in range(_PROBES):
+            offset = ((home + probe) % ACTIVITY_SLOTS) * _SLOT.size
+            fields = _SLOT.unpack_from(table, offset)
+            if fields[0] in (key, 0):
+                slot = offset
+                break
+            if stalest is None or fields[1] < stalest_time:
+                stalest, stalest_time = offset, fields[1]
+
+        if slot is None or _SLOT.unpack_from(table, slot)[0] != key:
+            slot = slot if slot is not None else stalest
+            last, start, count, previous = None, now, 0, 0
+        else:
+            _, last, start, count, previous = _SLOT.unpack_from(table, slot)
+
+        elapsed = now - start
+        if elapsed >= 2 * WINDOW:
+            start, count, previous = now, 0, 0
+        elif elapsed >= WINDOW:
+            start, count, previous = start + WINDOW, 0, count
+        count += 1
+
+        _SLOT.pack_into(table, slot, key, now, start, count, previous)
+    finally:
+        fcntl.flock(_fd, fcntl.LOCK_UN)
+
+    # Weight the previous bucket by how much of it still overlaps the window
+    overlap = max(0.0, 1 - (now - start) / WINDOW)
+    return last, count + int(previous * overlap)
@@ -0,0 +1,6 @@
+# utils/backends/__init__.py
+"""Pluggable persistence for the in-memory score store."""
+from .base import ScoreBackend
+from .sqlite import SqliteBackend
+from .json import JsonBackend
+from .sharded import ShardedJsonBackend
@@ -0,0 +1,91 @@
+# utils/backends/base.py
+"""Interface every score backend implements."""
+
+
+class ScoreBackend:
+    """Durable home for the score list kept in memory by utils.storage.
+
+    The store owns the live list and calls these hooks while holding its
+    lock, so implementations do not need their own cross-thread locking.
+    The exception is fold(), which only ever runs one at a time.
+    """
+
+    name = "base"
+    # True if compact() rotates the change log; other workers are then told
+    # to follow their cursor into the rotated file (see pull_changes).
+    compact_rotates = True
+    # True if compaction can be split into seal() under the store lock and
+    # fold() outside it; otherwise the store calls compact() under the lock.
+    folds_off_lock = False
+
+    def load(self, readonly: bool = False) -> list[dict]:
+        """Return the full score list, recovering whatever can be recovered.
+
+        With readonly=True the backend may return a shared cached list.
+        """
+        raise NotImplementedError
+
+    def append(self, op: str, entries: list[dict]) -> None:
+        """Durably record entries that were just mutated."""
+        raise NotImplementedError
+
+    def compact(self, scores: list[dict]) -> bool:
+        """Fold recorded mutations into the main copy; True on success."""
+        raise NotImplementedError
+
+    def seal(self):
+        """Rotate the change log aside for fold(); called under the store lock.
+
+        Return a token for fold(), or None if nothing was recorded.
+        """
+        raise NotImplementedError
+
+    def fold(self, sealed) -> bool:
+        """Rebuild the main copy from the previous one plus the sealed change
+        log; called without the store lock. True on success."""
+        raise NotImplementedError
+
+    def replace(self, scores: list[dict]) -> bool:
+        """Overwrite everything with scores (restore / upload)."""
+        raise NotImplementedError
+
+    def iter_entries(self):
+        """Yield every entry; backends that can stream should override this."""
+        yield from self.load(readonly=True)
+
+    def backup(self, base_path: str) -> str | None:
+        """Write a backend-specific backup next to base_path.
+
+        Return the file written, or None to let the store write a plain
+        full snapshot instead.
+        """
+        return None
+
+    def reset_cursor(self) -> None:
+        """Mark everything currently on disk as already seen by this process.
+
+        append() keeps the cursor past what it wrote by itself.
+        """
+
+    def pull_changes(self) -> list[dict] | None:
+        """Entries other processes recorded since the cursor, oldest first,
+        including any recorded before a compaction rotated the change log.
+
+        Return None when they cannot be determined and a full reload is needed.
+        """
+        return None
+
+    def journal_segments(self) -> list[tuple[str, float | None]] | None:
+        """Journal files still on disk, archived or live, for point-in-time restore.
+
+        Each is (path, sealed at); live files have None. Return None when the
+        backend keeps no replayable mutation log.
+        """
+        return None
+
+    def has_pending(self) -> bool:
+        """True if mutations from a previous run still need compacting."""
+        return False
+
+    def close(self) -> None:
+        pass
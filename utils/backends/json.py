@@ -0,0 +1,73 @@
+# utils/backends/json.py
+"""
+scores.json snapshot plus the append-only journal (the default backend).
+
+Snapshot reading, validation and atomic writes are shared with backups and
+live in utils.snapshot_io.
+"""
+import os
+from ..logging import log_event
+from .. import journal, snapshot_io
+from .base import ScoreBackend
+
+
+class JsonBackend(ScoreBackend):
+    """scores.json snapshot plus the append-only journal (the default)."""
+
+    name = "json"
+    folds_off_lock = True
+
+    def __init__(self):
+        self._cursor = (None, 0)    # journal.cursor() of what is already in memory
+
+    def load(self, readonly=False):
+        pending = journal.pending_paths()
+        scores = snapshot_io.load_snapshot(readonly=readonly and not pending)
+        for path in pending:
+            applied = journal.replay(scores, journal.read_records(path))
+            if applied:
+                log_event(f"📜 Replayed {applied} journal records from {os.path.basename(path)}")
+        return scores
+
+    def append(self, op, entries):
+        end = journal.append(op, entries)
+        self._cursor = (journal.inode(journal.JOURNAL_FILE), end)
+
+    def reset_cursor(self):
+        self._cursor = journal.cursor(journal.JOURNAL_FILE)
+
+    def pull_changes(self):
+        tailed = journal.tail(journal.JOURNAL_FILE, self._cursor)
+        if tailed is None:
+            return None
+        records, self._cursor = tailed
+        return [entry for record in records for entry in record["u"]]
+
+    def compact(self, scores):
+        journal.rotate()
+        if not snapshot_io.write_scores_file(scores):
+            return False
+        journal.archive_rotated()
+        return True
+
+    def seal(self):
+        journal.rotate()
+        return True if journal.pending_paths() else None
+
+    def fold(self, sealed):
+        # Also picks up a .compacting left behind by a compaction that died
+        scores = snapshot_io.load_snapshot()
+        journal.replay(scores, journal.read_records(journal.JOURNAL_FILE + ".compacting"))
+        if not snapshot_io.write_scores_file(scores):
+            return False
+        journal.archive_rotated()
+        return True
+
+    def replace(self, scores):
+        return self.compact(scores)
+
+    def journal_segments(self):
+        return journal.archived() + [(p, None) for p in journal.pending_paths()]
+
+    def has_pending(self):
+        return bool(journal.pending_paths())
@@ -0,0 +1,59 @@
+# utils/backends/migrate.py
+"""
+One-shot import of scores.json (+ pending journal) and rewards.json into
+the SQLite backend.
+
+    python -m utils.backends.migrate [--db PATH] [--rewards PATH]
+
+Run it with the app stopped, then start the app with SCORES_BACKEND=sqlite.
+
+Only the scores move: the reward ledger stays in rewards.json, which
+routes/rewards.py keeps reading and writing under every backend. The
+rewards table is an archival copy of the ledger as of the migration and
+is not kept up to date afterwards.
+"""
+import argparse
+import json
+import os
+from ..logging import log_event
+from ..paths import DATA_DIR
+from ..snapshot_io import validate_scores
+from .sqlite import SqliteBackend
+from .json import JsonBackend
+
+SCORES_DB = os.path.join(DATA_DIR, "scores.db")
+REWARDS_FILE = os.path.join(DATA_DIR, "rewards.json")
+
+
+def migrate(db_path: str, rewards_path: str) -> tuple[int, int]:
+    scores = JsonBackend().load()
+    if not validate_scores(scores):
+        raise ValueError("scores.json did not validate — aborting migration")
+
+    ledger = []
+    if os.path.exists(rewards_path):
+        with open(rewards_path, "r") as f:
+            ledger = json.load(f)
+
+    backend = SqliteBackend(db_path)
+    try:
+        if not backend.replace(scores):
+            raise RuntimeError("failed to write users to SQLite")
+        rewards = backend.import_rewards(ledger)
+    finally:
+        backend.close()
+    return len(scores), rewards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import JSON score data into SQLite")
+    parser.add_argument("--db", default=SCORES_DB)
+    parser.add_argument("--rewards", default=REWARDS_FILE)
+    args = parser.parse_args()
+
+    users, rewards = migrate(args.db, args.rewards)
+    log_event(f"🚚 Migrated {users} users and {rewards} rewards into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
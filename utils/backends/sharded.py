@@ -0,0 +1,231 @@
+# utils/backends/sharded.py
+"""
+Scores split across several JSON snapshots by user_id hash
+(SCORES_BACKEND=sharded).
+
+Snapshot reading, validation and atomic writes are shared with backups and
+live in utils.snapshot_io.
+"""
+import os
+import json
+import zlib
+import fcntl
+from ..logging import log_event
+from .. import journal, snapshot_io
+from .base import ScoreBackend
+from .json import JsonBackend
+
+
+def shard_of(user_id, shards):
+    """Stable shard number for a user_id (same in every process)."""
+    return zlib.crc32(user_id.encode()) % shards
+
+
+class ShardedJsonBackend(ScoreBackend):
+    """Scores split across folder by user_id hash.
+
+    Every shard has its own snapshot, journal and lock file, so a mutation
+    or compaction only touches the shards of the users involved. Entries are
+    returned shard by shard, keeping insertion order within each shard.
+    """
+
+    name = "sharded"
+    folds_off_lock = True
+
+    def __init__(self, folder, shards, backup_folder):
+        self.folder = folder
+        self.shards = shards
+        self.backup_folder = backup_folder
+        self._members = [{} for _ in range(shards)]  # shard -> {user_id: live entry}
+        self._versions = [0] * shards                # bumped on every append
+        self._dirty = set()                          # shards newer than their snapshot
+        self._backed_up = {}                         # shard -> (version, backup file)
+        self._cursors = [(None, 0)] * shards         # journal.cursor() already in memory
+
+    def _path(self, i, kind):
+        return os.path.join(self.folder, f"shard_{i:03d}.{kind}")
+
+    def _read_shard(self, i, sealed_only=False):
+        path = self._path(i, "snapshot")
+        entries = []
+        if os.path.exists(path):
+            try:
+                entries = snapshot_io.read_snapshot(path)
+                if not snapshot_io.validate_scores(entries):
+                    raise ValueError("Invalid format")
+            except snapshot_io.DECODE_ERRORS as e:
+                log_event(f"❌ Shard {i} unreadable: {e} — using its latest backup copy")
+                entries = self._read_backup_shard(i)
+        for path in journal.pending_paths(self._path(i, "journal")):
+            if not sealed_only or path.endswith(".compacting"):
+                journal.replay(entries, journal.read_records(path))
+        return entries
+
+    def _read_backup_shard(self, i):
+        prefix = f"shard_{i:03d}_"
+        try:
+            names = sorted(f for f in os.listdir(self.backup_folder) if f.startswith(prefix))
+        except FileNotFoundError:
+            names = []
+        for name in reversed(names):
+            try:
+                entries = snapshot_io.read_snapshot(os.path.join(self.backup_folder, name))
+                if snapshot_io.validate_scores(entries):
+                    return entries
+            except Exception as e:
+                log_event(f"⚠️ Skipped invalid shard backup {name}: {e}")
+        return []
+
+    def iter_entries(self):
+        for i in range(self.shards):
+            yield from self._read_shard(i)
+
+    def load(self, readonly=False):
+        if not os.path.isdir(self.folder) or not os.listdir(self.folder):
+            scores = JsonBackend().load()
+            log_event(f"🔀 Splitting {len(scores)} users from scores.json into {self.shards} shards")
+            self.replace(scores)
+            return scores
+
+        scores = []
+        for i in range(self.shards):
+            entries = self._read_shard(i)
+            self._members[i] = {}
+            for entry in entries:
+                self._members[i].setdefault(entry["user_id"], entry)
+            if journal.pending_paths(self._path(i, "journal")):
+                self._dirty.add(i)
+            scores.extend(entries)
+        return scores
+
+    def append(self, op, entries):
+        by_shard = {}
+        for entry in entries:
+            by_shard.setdefault(shard_of(entry["user_id"], self.shards), []).append(entry)
+        for i, group in by_shard.items():
+            end = journal.append(op, group, self._path(i, "journal"))
+            self._cursors[i] = (journal.inode(self._path(i, "journal")), end)
+            for entry in group:
+                self._members[i].setdefault(entry["user_id"], entry)
+            self._versions[i] += 1
+            self._dirty.add(i)
+
+    def reset_cursor(self):
+        self._cursors = [journal.cursor(self._path(i, "journal")) for i in range(self.shards)]
+
+    def pull_changes(self):
+        changed = []
+        for i in range(self.shards):
+            tailed = journal.tail(self._path(i, "journal"), self._cursors[i])
+            if tailed is None:
+                return None
+            records, self._cursors[i] = tailed
+            if not records:
+                continue
+            for record in records:
+                for entry in record["u"]:
+                    self._members[i].setdefault(entry["user_id"], entry)
+                    changed.append(entry)
+            self._versions[i] += 1
+            self._dirty.add(i)
+        return changed
+
+    def _write_shard(self, i):
+        entries = list(self._members[i].values())
+        if not snapshot_io.validate_scores(entries):
+            log_event(f"❌ Invalid entries in shard {i} — skipping save.")
+            return False
+        os.makedirs(self.folder, exist_ok=True)
+        journal_path = self._path(i, "journal")
+        try:
+            with open(self._path(i, "lock"), "a") as lock_f:
+                fcntl.flock(lock_f, fcntl.LOCK_EX)
+                journal.rotate(journal_path)
+                snapshot_io.atomic_write(self._path(i, "snapshot"), snapshot_io.encode_scores(entries))
+                journal.archive_rotated(journal_path)
+                fcntl.flock(lock_f, fcntl.LOCK_UN)
+            return True
+        except Exception as e:
+            log_event(f"❌ Failed to save shard {i}: {e}")
+            return False
+
+    def compact(self, scores):
+        ok = True
+        for i in sorted(self._dirty):
+            if self._write_shard(i):
+                self._dirty.discard(i)
+            else:
+                ok = False
+        return ok
+
+    def seal(self):
+        sealed = {}
+        for i in range(self.shards):
+            path = self._path(i, "journal")
+            journal.rotate(path)
+            if journal.pending_paths(path):
+                sealed[i] = self._versions[i]
+        return sealed or None
+
+    def fold(self, sealed):
+        ok = True
+        for i, version in sorted((sealed or {}).items()):
+            entries = self._read_shard(i, sealed_only=True)
+            if not snapshot_io.validate_scores(entries):
+                log_event(f"❌ Invalid entries in shard {i} — skipping save.")
+                ok = False
+                continue
+            try:
+                snapshot_io.atomic_write(self._path(i, "snapshot"), snapshot_io.encode_scores(entries))
+                journal.archive_rotated(self._path(i, "journal"))
+            except Exception as e:
+                log_event(f"❌ Failed to save shard {i}: {e}")
+                ok = False
+                continue
+            if self._versions[i] == version:
+                self._dirty.discard(i)  # nothing appended to it since seal()
+        return ok
+
+    def replace(self, scores):
+        self._members = [{} for _ in range(self.shards)]
+        for entry in scores:
+            self._members[shard_of(entry["user_id"], self.shards)].setdefault(entry["user_id"], entry)
+        self._dirty = set(range(self.shards))
+        for i in range(self.shards):
+            self._versions[i] += 1
+        return self.compact(scores)
+
+    def journal_segments(self):
+        segments = []
+        for i in range(self.shards):
+            path = self._path(i, "journal")
+            segments += journal.archived(path) + [(p, None) for p in journal.pending_paths(path)]
+        return segments
+
+    def has_pending(self):
+        return any(journal.pending_paths(self._path(i, "journal")) for i in range(self.shards))
+
+    def backup(self, base_path):
+        """Write a manifest backup that only copies shards changed since the last one."""
+        os.makedirs(self.backup_folder, exist_ok=True)
+        stamp = os.path.basename(base_path)
+        files = {}
+        for i in range(self.shards):
+            done = self._backed_up.get(i)
+            if done and done[0] == self._versions[i] and os.path.exists(os.path.join(self.backup_folder, done[1])):
+                files[str(i)] = done[1]
+                continue
+            name = f"shard_{i:03d}_{stamp}.snapshot"
+            dest = os.path.join(self.backup_folder, name)
+            if i not in self._dirty and os.path.exists(self._path(i, "snapshot")):
+                with open(self._path(i, "snapshot"), "rb") as src:
+                    snapshot_io.copy_file(src.fileno(), dest)  # committed file is current
+            else:
+                snapshot_io.atomic_write(dest, snapshot_io.encode_scores(list(self._members[i].values())))
+            self._backed_up[i] = (self._versions[i], name)
+            files[str(i)] = name
+
+        path = base_path + ".json"
+        manifest = {"format": "sharded", "shards": self.shards, "files": files}
+        snapshot_io.atomic_write(path, json.dumps(manifest, indent=2))
+        return path
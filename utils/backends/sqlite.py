@@ -0,0 +1,240 @@
+# utils/backends/sqlite.py
+"""
+SQLite (WAL mode) score backend.
+
+One row per user with indexed user_id / score columns; referrals and
+tasks_done live in their own tables so a mutation only touches the rows of
+the users it changed. Everything stays in a single local file.
+"""
+import os
+import json
+import sqlite3
+import threading
+from ..logging import log_event
+from .base import ScoreBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    seq     INTEGER NOT NULL,
+    score   INTEGER NOT NULL DEFAULT 0,
+    data    TEXT NOT NULL,
+    rev     INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_users_score ON users (score DESC, seq);
+CREATE INDEX IF NOT EXISTS idx_users_seq ON users (seq);
+CREATE INDEX IF NOT EXISTS idx_users_rev ON users (rev);
+
+CREATE TABLE IF NOT EXISTS referrals (
+    referrer_id TEXT NOT NULL,
+    pos         INTEGER NOT NULL,
+    ref_user_id TEXT,
+    data        TEXT NOT NULL,
+    PRIMARY KEY (referrer_id, pos)
+);
+CREATE INDEX IF NOT EXISTS idx_referrals_ref_user ON referrals (ref_user_id);
+
+CREATE TABLE IF NOT EXISTS tasks_done (
+    user_id TEXT NOT NULL,
+    pos     INTEGER NOT NULL,
+    task_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, pos)
+);
+
+-- Archival copy of rewards.json taken by utils.backends.migrate; the live
+-- ledger stays in rewards.json and nothing writes here afterwards.
+CREATE TABLE IF NOT EXISTS rewards (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp   TEXT,
+    user_id     TEXT,
+    reward_type TEXT,
+    source_id   TEXT,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rewards_user ON rewards (user_id);
+"""
+
+# Lists stored in their own tables; the users.data blob keeps an empty
+# placeholder so key order and presence survive a round trip.
+_LIST_FIELDS = ("referrals", "tasks_done")
+
+
+class SqliteBackend(ScoreBackend):
+    name = "sqlite"
+    compact_rotates = False  # checkpoints leave rows (and revs) untouched
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(users)")]
+        if columns and "rev" not in columns:
+            self._conn.execute("ALTER TABLE users ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+        self._conn.executescript(SCHEMA)
+        self._rev = 0  # highest users.rev already in memory
+
+    # ---------- reads ---------------------------------------------------- #
+    def load(self, readonly: bool = False) -> list[dict]:
+        with self._lock:
+            cur = self._conn.cursor()
+            referrals, tasks = {}, {}
+            for referrer_id, data in cur.execute(
+                "SELECT referrer_id, data FROM referrals ORDER BY referrer_id, pos"
+            ):
+                referrals.setdefault(referrer_id, []).append(json.loads(data))
+            for user_id, task_id in cur.execute(
+                "SELECT user_id, task_id FROM tasks_done ORDER BY user_id, pos"
+            ):
+                tasks.setdefault(user_id, []).append(task_id)
+
+            return [
+                self._entry(user_id, score, data, referrals, tasks)
+                for user_id, score, data in cur.execute("SELECT user_id, score, data FROM users ORDER BY seq")
+            ]
+
+    def reset_cursor(self) -> None:
+        with self._lock:
+            self._rev = self._conn.execute("SELECT COALESCE(MAX(rev), 0) FROM users").fetchone()[0]
+
+    def pull_changes(self) -> list[dict]:
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                rows = cur.execute(
+                    "SELECT user_id, score, data, rev FROM users WHERE rev > ? ORDER BY rev, seq", (self._rev,)
+                ).fetchall()
+                referrals, tasks = {}, {}
+                for user_id, *_ in rows:
+                    referrals[user_id] = [
+                        json.loads(d) for (d,) in cur.execute(
+                            "SELECT data FROM referrals WHERE referrer_id = ? ORDER BY pos", (user_id,)
+                        )
+                    ]
+                    tasks[user_id] = [
+                        t for (t,) in cur.execute(
+                            "SELECT task_id FROM tasks_done WHERE user_id = ? ORDER BY pos", (user_id,)
+                        )
+                    ]
+            finally:
+                cur.execute("COMMIT")
+        if rows:
+            self._rev = rows[-1][3]
+        return [self._entry(user_id, score, data, referrals, tasks) for user_id, score, data, _ in rows]
+
+    # ---------- writes --------------------------------------------------- #
+    def append(self, op: str, entries: list[dict]) -> None:
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                rev = cur.execute("SELECT COALESCE(MAX(rev), 0) + 1 FROM users").fetchone()[0]
+                for entry in entries:
+                    self._upsert(cur, entry, rev=rev)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            self._rev = rev
+
+    def compact(self, scores: list[dict]) -> bool:
+        # Rows are already current; just keep the WAL file from growing.
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return True
+
+    def replace(self, scores: list[dict]) -> bool:
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.execute("DELETE FROM users")
+                cur.execute("DELETE FROM referrals")
+                cur.execute("DELETE FROM tasks_done")
+                for seq, entry in enumerate(scores):
+                    self._upsert(cur, entry, seq=seq)
+                cur.execute("COMMIT")
+            except Exception as e:
+                cur.execute("ROLLBACK")
+                log_event(f"❌ Failed to replace scores in {os.path.basename(self.path)}: {e}")
+                return False
+        return True
+
+    def import_rewards(self, ledger: list[dict]) -> int:
+        """Archive a rewards.json ledger into the rewards table (replacing it).
+
+        One-off, at migration time: the app keeps the live ledger in rewards.json.
+        """
+        rows = [
+            (e.get("timestamp"), e.get("user_id"), e.get("reward_type"), e.get("source_id"), json.dumps(e))
+            for e in ledger if isinstance(e, dict)
+        ]
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.execute("DELETE FROM rewards")
+                cur.executemany(
+                    "INSERT INTO rewards (timestamp, user_id, reward_type, source_id, data) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                cur.execute("COMMIT")
+            except Exception as e:
+                cur.execute("ROLLBACK")  # keep the previous archive rather than half of this one
+                log_event(f"❌ Failed to import rewards into {os.path.basename(self.path)}: {e}")
+                raise
+            return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ---------- helpers -------------------------------------------------- #
+    @staticmethod
+    def _entry(user_id: str, score: int, data: str, referrals: dict, tasks: dict) -> dict:
+        entry = json.loads(data)
+        entry["score"] = score
+        if "referrals" in entry or user_id in referrals:
+            entry["referrals"] = referrals.get(user_id, [])
+        if "tasks_done" in entry or user_id in tasks:
+            entry["tasks_done"] = tasks.get(user_id, [])
+        return entry
+
+    def _upsert(self, cur, entry: dict, seq: int | None = None, rev: int = 0) -> None:
+        user_id = entry["user_id"]
+        blob = {k: ([] if k in _LIST_FIELDS else v) for k, v in entry.items()}
+        if seq is None:
+            row = cur.execute("SELECT seq FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            seq = row[0] if row else cur.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM users").fetchone()[0]
+        cur.execute(
+            "INSERT INTO users (user_id, seq, score, data, rev) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET score = excluded.score, data = excluded.data, rev = excluded.rev",
+            (user_id, seq, entry.get("score", 0), json.dumps(blob, separators=(",", ":")), rev),
+        )
+
+        # Both lists only ever grow, so normally this inserts just the tail.
+        referrals = entry.get("referrals") or []
+        have = cur.execute("SELECT COUNT(*) FROM referrals WHERE referrer_id = ?", (user_id,)).fetchone()[0]
+        if have > len(referrals):
+            cur.execute("DELETE FROM referrals WHERE referrer_id = ?", (user_id,))
+            have = 0
+        cur.executemany(
+            "INSERT OR REPLACE INTO referrals (referrer_id, pos, ref_user_id, data) VALUES (?, ?, ?, ?)",
+            [
+                (user_id, pos, r.get("ref_user_id"), json.dumps(r, separators=(",", ":")))
+                for pos, r in enumerate(referrals) if pos >= have
+            ],
+        )
+
+        tasks = entry.get("tasks_done") or []
+        have = cur.execute("SELECT COUNT(*) FROM tasks_done WHERE user_id = ?", (user_id,)).fetchone()[0]
+        if have > len(tasks):
+            cur.execute("DELETE FROM tasks_done WHERE user_id = ?", (user_id,))
+            have = 0
+        cur.executemany(
+            "INSERT OR REPLACE INTO tasks_done (user_id, pos, task_id) VALUES (?, ?, ?)",
+            [(user_id, pos, t) for pos, t in enumerate(tasks) if pos >= have],
+        )
@@ -0,0 +1,127 @@
+# utils/backup_catalog.py
+"""
+Persistent catalog of score backups.
+
+One record per backup file:
+    {"file", "created" (unix), "timestamp" (GMT-4 ISO), "tag", "format",
+     "size", "sha256", "records", "validated"}
+
+Recovery, the /backups listing and "latest backup" lookups read this
+instead of listing, stat-ing and parsing the backup folder. validated is
+True once the content parsed and passed validate_scores, False once it
+failed, and None for files catalogued from a directory scan.
+"""
+import os
+import json
+import fcntl
+import threading
+from .logging import log_event
+from .paths import DATA_DIR
+
+CATALOG_FILE = os.path.join(DATA_DIR, "backup_catalog.json")
+
+_lock = threading.Lock()
+_cache_key = None
+_cache = []     # records sorted oldest first
+_rebuild = None  # () -> records for the files on disk; seeds a missing catalog
+
+
+def register_rebuild(func) -> None:
+    """Declare how to rebuild a missing or unreadable catalog from the folder.
+
+    Every write goes through it, so the first backup on an existing install
+    keeps the older files instead of starting a catalog with just itself.
+    """
+    global _rebuild
+    _rebuild = func
+
+
+def _stat_key():
+    try:
+        st = os.stat(CATALOG_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _read():
+    """Records from disk, reusing the cached parse when the file is unchanged."""
+    global _cache_key, _cache
+    key = _stat_key()
+    if key is None:
+        return None
+    if key != _cache_key:
+        try:
+            with open(CATALOG_FILE, "r") as f:
+                records = json.load(f)["backups"]
+        except (ValueError, KeyError, TypeError) as e:
+            log_event(f"⚠️ Backup catalog unreadable ({e}) — it will be rebuilt")
+            return None
+        _cache_key, _cache = key, records
+    return _cache
+
+
+def _write(records):
+    global _cache_key, _cache
+    records.sort(key=lambda r: r["created"])
+    tmp = CATALOG_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"backups": records}, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, CATALOG_FILE)
+    _cache_key, _cache = _stat_key(), records
+
+
+def _update(change):
+    """Apply change(records) under a cross-process lock and persist it."""
+    os.makedirs(os.path.dirname(CATALOG_FILE), exist_ok=True)
+    with _lock, open(CATALOG_FILE + ".lock", "a") as lock_f:
+        fcntl.flock(lock_f, fcntl.LOCK_EX)
+        try:
+            records = _read()
+            records = list(records) if records is not None else (_rebuild() if _rebuild else [])
+            change(records)
+            _write(records)
+        finally:
+            fcntl.flock(lock_f, fcntl.LOCK_UN)
+
+
+def entries() -> list[dict]:
+    """All catalogued backups, newest first (rebuilt if the catalog is missing)."""
+    with _lock:
+        records = _read()
+    if records is None:
+        _update(lambda records: None)
+        with _lock:
+            records = _read() or []
+    return [dict(r) for r in reversed(records)]
+
+
+def add(record: dict) -> None:
+    def change(records):
+        records[:] = [r for r in records if r["file"] != record["file"]]
+        records.append(record)
+    _update(change)
+
+
+def remove(filename: str) -> None:
+    def change(records):
+        records[:] = [r for r in records if r["file"] != filename]
+    _update(change)
+
+
+def mark(filename: str, validated: bool) -> None:
+    def change(records):
+        for r in records:
+            if r["file"] == filename:
+                r["validated"] = validated
+    _update(change)
+
+
+def latest(tag: str | None = None) -> dict | None:
+    """Newest backup (with the given tag, if any) not known to be broken."""
+    for record in entries():
+        if record["validated"] is not False and (tag is None or record["tag"] == tag):
+            return record
+    return None
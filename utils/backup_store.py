@@ -0,0 +1,253 @@
+# utils/backup_store.py
+"""
+Content-addressed, compressed chunk store shared by score and subscription
+backups (SCORES_BACKUP_MODE=cas).
+
+A backup is a small JSON manifest naming its chunks by sha256:
+    {"format": "cas", "kind": "records" | "bytes", "codec": "gzip",
+     "chunks": ["<sha256>", ...], "hot": ["<sha256>", ...],
+     "count": <records or bytes>}
+
+Score lists are split in two streams, each chunked every CHUNK_RECORDS
+entries (one JSON line each). HOT_FIELDS, which change with every tap, go
+to "hot"; everything else stays in "chunks". A block of cold fields only
+hashes the same across backups if none of its users registered, renamed,
+referred or finished a task in between, so dedup is limited to the cold
+stream of quiet blocks; the hot stream is rewritten whole. Other documents
+are cut into CHUNK_BYTES pieces. Chunks are compressed with zstd when
+installed, otherwise gzip.
+"""
+import os
+import gzip
+import json
+import hashlib
+import time
+from .logging import log_event
+from .paths import DATA_DIR
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+OBJECT_FOLDER = os.path.join(DATA_DIR, "backup_objects")
+CHUNK_RECORDS = 1000
+CHUNK_BYTES = 64 * 1024
+HOT_FIELDS = ("score", "windows")
+CODEC = "zstd" if zstandard else "gzip"
+_EXT = {"gzip": ".gz", "zstd": ".zst"}
+
+_manifest_folders = set()   # folders whose *.json files may be manifests (for gc)
+
+
+def register_folder(folder: str) -> None:
+    """Declare a folder holding manifests so gc() keeps their chunks."""
+    _manifest_folders.add(os.path.abspath(folder))
+
+
+def is_manifest(data) -> bool:
+    return isinstance(data, dict) and data.get("format") == "cas"
+
+
+def load_manifest(path: str) -> dict | None:
+    """The manifest stored at path, or None if it is an ordinary file."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(64)
+            if b'"cas"' not in head:
+                return None
+            manifest = json.loads(head + f.read())
+    except (OSError, ValueError):
+        return None
+    return manifest if is_manifest(manifest) else None
+
+
+def _object_path(digest: str, codec: str) -> str:
+    return os.path.join(OBJECT_FOLDER, digest[:2], digest + _EXT[codec])
+
+
+def _compress(raw: bytes) -> bytes:
+    if CODEC == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    return gzip.compress(raw, compresslevel=6, mtime=0)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd chunk found but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _put_chunk(raw: bytes) -> tuple[str, bool]:
+    """Store one chunk unless it already exists; return (digest, written)."""
+    digest = hashlib.sha256(raw).hexdigest()
+    path = _object_path(digest, CODEC)
+    if os.path.exists(path):
+        return digest, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_compress(raw))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return digest, True
+
+
+def _manifest(kind: str, chunks: list[str], count: int, written: int, hot: list[str] | None = None) -> dict:
+    total = len(chunks) + len(hot or ())
+    if total:
+        log_event(f"🧩 Stored {kind} backup: {total} chunks, {written} new")
+    manifest = {"format": "cas", "kind": kind, "codec": CODEC, "chunks": chunks, "count": count}
+    if hot is not None:
+        manifest["hot"] = hot
+    return manifest
+
+
+def _put_lines(records: list[dict]) -> tuple[list[str], int]:
+    """Store records as JSON lines, CHUNK_RECORDS per chunk; return (digests, new)."""
+    chunks, written = [], 0
+    for start in range(0, len(records), CHUNK_RECORDS):
+        block = records[start:start + CHUNK_RECORDS]
+        raw = b"".join(json.dumps(r, separators=(",", ":")).encode() + b"\n" for r in block)
+        digest, new = _put_chunk(raw)
+        chunks.append(digest)
+        written += new
+    return chunks, written
+
+
+def put_records(entries: list[dict]) -> dict:
+    """Chunk a score list into the store and return its manifest."""
+    # Hot fields keep a None placeholder in the cold record so merging restores key order
+    cold = [{k: None if k in HOT_FIELDS else v for k, v in e.items()} for e in entries]
+    hot = [{k: e[k] for k in HOT_FIELDS if k in e} for e in entries]
+    cold_chunks, cold_new = _put_lines(cold)
+    hot_chunks, hot_new = _put_lines(hot)
+    return _manifest("records", cold_chunks, len(entries), cold_new + hot_new, hot=hot_chunks)
+
+
+def put_bytes(data: bytes) -> dict:
+    """Chunk an arbitrary document into the store and return its manifest."""
+    chunks, written = [], 0
+    for start in range(0, len(data), CHUNK_BYTES):
+        digest, new = _put_chunk(data[start:start + CHUNK_BYTES])
+        chunks.append(digest)
+        written += new
+    return _manifest("bytes", chunks, len(data), written)
+
+
+def iter_chunks(manifest: dict, stream: str = "chunks"):
+    """Yield decompressed chunks one at a time."""
+    codec = manifest.get("codec", "gzip")
+    for digest in manifest[stream]:
+        with open(_object_path(digest, codec), "rb") as f:
+            raw = _decompress(f.read(), codec)
+        if hashlib.sha256(raw).hexdigest() != digest:
+            raise ValueError(f"chunk {digest[:12]} is corrupt")
+        yield raw
+
+
+def _iter_lines(manifest: dict, stream: str):
+    for raw in iter_chunks(manifest, stream):
+        for line in raw.splitlines():
+            yield json.loads(line)
+
+
+def iter_records(manifest: dict):
+    if "hot" not in manifest:  # written before hot fields were split off
+        yield from _iter_lines(manifest, "chunks")
+        return
+    # strict: a stream cut short is corruption, not fewer users
+    for entry, hot in zip(_iter_lines(manifest, "chunks"), _iter_lines(manifest, "hot"), strict=True):
+        entry.update(hot)
+        yield entry
+
+
+def read_records(manifest: dict) -> list[dict]:
+    return list(iter_records(manifest))
+
+
+def read_bytes(manifest: dict) -> bytes:
+    return b"".join(iter_chunks(manifest))
+
+
+def read_file(path: str) -> bytes:
+    """Contents of a backup file, reassembling it if it is a bytes manifest."""
+    manifest = load_manifest(path)
+    if manifest is not None and manifest["kind"] == "bytes":
+        return read_bytes(manifest)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_manifest(path: str, manifest: dict) -> bytes:
+    """Atomically write a manifest file; return the bytes written."""
+    data = json.dumps(manifest, separators=(",", ":")).encode()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return data
+
+
+def stream_json(manifest: dict, pretty: bool = False):
+    """Yield the backup as JSON text, decompressing chunk by chunk.
+
+    Records come out exactly as encode_scores(list, "json-pretty" or "json") would.
+    """
+    if manifest["kind"] == "bytes":
+        yield from iter_chunks(manifest)
+        return
+    yield from json_pieces(iter_records(manifest), pretty)
+
+
+def json_pieces(entries, pretty: bool = False):
+    """Yield a JSON array of entries piece by piece, formatted like encode_scores()."""
+    first = True
+    for entry in entries:
+        if first:
+            yield b"[\n" if pretty else b"["
+        if pretty:
+            text = "\n".join("  " + line for line in json.dumps(entry, indent=2).splitlines())
+            yield (("" if first else ",\n") + text).encode()
+        else:
+            yield (("" if first else ",") + json.dumps(entry, separators=(",", ":"))).encode()
+        first = False
+    if first:
+        yield b"[]"
+    else:
+        yield b"\n]" if pretty else b"]"
+
+
+def gc(min_age: float = 3600) -> int:
+    """Delete chunks no manifest in a registered folder refers to.
+
+    Chunks younger than min_age seconds are kept: their manifest may still
+    be being written.
+    """
+    if not os.path.isdir(OBJECT_FOLDER):
+        return 0
+    referenced = set()
+    for folder in _manifest_folders:
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            manifest = load_manifest(os.path.join(folder, name)) if name.endswith(".json") else None
+            if manifest is not None:
+                referenced.update(manifest["chunks"])
+                referenced.update(manifest.get("hot", ()))
+
+    removed, cutoff = 0, time.time() - min_age
+    for sub in os.listdir(OBJECT_FOLDER):
+        for name in os.listdir(os.path.join(OBJECT_FOLDER, sub)):
+            path = os.path.join(OBJECT_FOLDER, sub, name)
+            if name.split(".")[0] not in referenced and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    if removed:
+        log_event(f"🧹 Removed {removed} unreferenced backup chunks")
+    return removed
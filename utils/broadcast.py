@@ -0,0 +1,82 @@
+# utils/broadcast.py
+"""
+Change notifications for long-lived push connections (server-sent events).
+
+One watcher thread per process polls the shared data version (an mmap
+read) and wakes every waiting stream through a Condition when it moves,
+so an idle stream costs a sleeping waiter, not a polling loop. The number
+of open streams is capped per process.
+
+Workers are threaded (gunicorn gthread, see Procfile) and a stream holds
+one thread while it waits, so SSE_MAX_CONNECTIONS has to stay below
+WEB_THREADS to leave threads for ordinary requests. Greenlet workers are
+not used: the store blocks on flock and fsync, and compacts and rebuilds
+the leaderboard in plain CPU-bound Python, all of which would stall every
+other stream and request in the worker.
+"""
+import os
+import time
+import threading
+from .storage import data_version
+
+SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "100"))  # per worker process, < WEB_THREADS
+SSE_POLL_INTERVAL = 0.25   # seconds between data version checks
+
+_cond = threading.Condition()
+_version = None
+_watcher = None
+_slots = threading.BoundedSemaphore(SSE_MAX_CONNECTIONS)
+_open = 0
+
+
+def _watch():
+    global _version
+    while True:
+        version = data_version()[0]
+        if version != _version:
+            with _cond:
+                _version = version
+                _cond.notify_all()
+        time.sleep(SSE_POLL_INTERVAL)
+
+
+def _ensure_watcher():
+    global _watcher, _version
+    with _cond:
+        if _watcher is None:
+            _version = data_version()[0]
+            _watcher = threading.Thread(target=_watch, name="sse-watcher", daemon=True)
+            _watcher.start()
+
+
+def acquire() -> bool:
+    """Reserve a stream slot; False when the cap is reached."""
+    global _open
+    if not _slots.acquire(blocking=False):
+        return False
+    _ensure_watcher()
+    with _cond:
+        _open += 1
+    return True
+
+
+def release() -> None:
+    global _open
+    with _cond:
+        _open -= 1
+    _slots.release()
+
+
+def current() -> str | None:
+    return _version
+
+
+def wait(seen: str | None, timeout: float) -> str | None:
+    """Block until the data version differs from seen, or timeout; return it."""
+    with _cond:
+        _cond.wait_for(lambda: _version != seen, timeout)
+        return _version
+
+
+def stats() -> dict:
+    return {"open": _open, "max": SSE_MAX_CONNECTIONS}
@@ -0,0 +1,114 @@
+# utils/coherence.py
+"""
+Cross-process coordination for the in-memory score store.
+
+Every worker process keeps its own copy of the scores. Three counters live
+in a small memory-mapped file shared by all workers on the box:
+
+    generation – bumped after every journalled mutation
+    epoch      – bumped whenever the journal is rotated or scores replaced
+    replaced   – bumped whenever scores are replaced wholesale
+
+plus, for HTTP validators, a count of data changes (unlike generation it
+does not move on compaction), the time of the last one, and a random nonce
+picked when the file is created so counters never repeat across a wipe.
+
+Readers compare the counters with the values they last saw (one mmap read,
+no syscalls) and catch up only when they moved: tail the journal for a new
+generation, follow it into the rotated file for a new epoch, and reload the
+snapshot only when scores were replaced. Writers hold an exclusive
+flock on LOCK_FILE for the whole read-modify-write so they never act on a
+stale copy.
+"""
+import os
+import mmap
+import fcntl
+import struct
+import random
+import threading
+import time
+from .paths import DATA_DIR
+
+COHERENCE_FILE = os.path.join(DATA_DIR, ".scores.coherence")
+LOCK_FILE = os.path.join(DATA_DIR, ".scores.lock")
+
+_HEADER = struct.Struct("<QQ")  # generation, epoch
+_CHANGES = struct.Struct("<QQd")  # changes, nonce, last change time; follows _HEADER
+_REPLACED = struct.Struct("<Q")   # follows _CHANGES
+_SIZE = _HEADER.size + _CHANGES.size + _REPLACED.size
+
+_init_lock = threading.Lock()
+_map = None
+_lock_fd = None
+_lock_pid = None
+
+
+def _mapping():
+    global _map
+    if _map is None:
+        with _init_lock:
+            if _map is None:
+                os.makedirs(os.path.dirname(COHERENCE_FILE), exist_ok=True)
+                fd = os.open(COHERENCE_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    if os.fstat(fd).st_size < _SIZE:
+                        os.ftruncate(fd, _SIZE)
+                    m = mmap.mmap(fd, _SIZE)
+                finally:
+                    os.close(fd)
+                changes, nonce, changed_at = _CHANGES.unpack_from(m, _HEADER.size)
+                if not nonce:
+                    _CHANGES.pack_into(m, _HEADER.size, changes, random.getrandbits(63) or 1, time.time())
+                _map = m
+    return _map
+
+
+def read() -> tuple[int, int, int]:
+    """Current (generation, epoch, replaced) as published by any worker."""
+    m = _mapping()
+    return _HEADER.unpack_from(m, 0) + _REPLACED.unpack_from(m, _HEADER.size + _CHANGES.size)
+
+
+def bump(epoch: bool = False, changed: bool = True, replaced: bool = False) -> tuple[int, int, int]:
+    """Publish a change. Call only while holding the write lock.
+
+    Pass epoch=True when the journal was rotated, replaced=True (which
+    implies it) when the scores were swapped wholesale, and changed=False
+    when the data itself is unchanged (compaction).
+    """
+    m = _mapping()
+    generation, current_epoch = _HEADER.unpack_from(m, 0)
+    (current_replaced,) = _REPLACED.unpack_from(m, _HEADER.size + _CHANGES.size)
+    generation += 1
+    if epoch or replaced:
+        current_epoch += 1
+    if replaced:
+        current_replaced += 1
+        _REPLACED.pack_into(m, _HEADER.size + _CHANGES.size, current_replaced)
+    if changed:
+        changes, nonce, _ = _CHANGES.unpack_from(m, _HEADER.size)
+        _CHANGES.pack_into(m, _HEADER.size, changes + 1, nonce, time.time())
+    _HEADER.pack_into(m, 0, generation, current_epoch)
+    return generation, current_epoch, current_replaced
+
+
+def data_version() -> tuple[int, int, float]:
+    """(changes, nonce, time of last change), shared by all workers."""
+    return _CHANGES.unpack_from(_mapping(), _HEADER.size)
+
+
+def acquire() -> None:
+    """Take the cross-process write lock (not reentrant; see utils.storage)."""
+    global _lock_fd, _lock_pid
+    with _init_lock:
+        # flock is per open file, so a worker forked from a preloaded parent
+        # needs its own descriptor or it would share the parent's lock.
+        if _lock_fd is None or _lock_pid != os.getpid():
+            os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
+            _lock_fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+            _lock_pid = os.getpid()
+    fcntl.flock(_lock_fd, fcntl.LOCK_EX)
+
+
+def release() -> None:
+    fcntl.flock(_lock_fd, fcntl.LOCK_UN)
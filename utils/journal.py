@@ -0,0 +1,240 @@
+# utils/journal.py
+"""
+Append-only write-ahead journal for score mutations.
+
+Each line is one compact JSON record:
+    {"t": <unix time>, "op": "score", "u": [<full user entry>, ...]}
+
+Entries are whole-record upserts, so replaying a record twice is harmless.
+The compactor rotates the live journal aside, writes a fresh snapshot and
+then moves the rotated file into JOURNAL_ARCHIVE, where it backs
+point-in-time restores until retention drops it. Worker processes tail the
+journal with tail() to pick up each other's writes, following it across
+rotations by inode.
+"""
+import os
+import json
+import fcntl
+import time
+from .logging import log_event
+from .paths import DATA_DIR
+
+JOURNAL_FILE = os.path.join(DATA_DIR, "scores.journal")
+JOURNAL_ARCHIVE = os.path.join(DATA_DIR, "journal_archive")
+
+
+def append(op: str, entries: list[dict], path: str = JOURNAL_FILE) -> int:
+    """Append one mutation record and fsync it; return the new file size."""
+    line = json.dumps({"t": time.time(), "op": op, "u": entries}, separators=(",", ":")) + "\n"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(line.encode())
+        f.flush()
+        os.fsync(f.fileno())
+        end = f.tell()
+        fcntl.flock(f, fcntl.LOCK_UN)
+    return end
+
+
+def size(path: str = JOURNAL_FILE) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def inode(path: str = JOURNAL_FILE) -> int | None:
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def cursor(path: str = JOURNAL_FILE) -> tuple[int, int]:
+    """(inode, size) of the live journal: a position that survives rotation.
+
+    Creates an empty journal if there is none, so there is an inode to follow.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as f:
+        st = os.fstat(f.fileno())
+    return st.st_ino, st.st_size
+
+
+def read_from(path: str, offset: int) -> tuple[list[dict], int]:
+    """Records appended after byte offset, and the offset to resume from.
+
+    Only whole lines are consumed, so a record still being written is
+    picked up by the next call.
+    """
+    if size(path) <= offset:
+        return [], offset
+    with open(path, "rb") as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        f.seek(offset)
+        data = f.read()
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+    data = data[:data.rfind(b"\n") + 1]
+    records = []
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+            if isinstance(record.get("u"), list):
+                records.append(record)
+        except (json.JSONDecodeError, AttributeError):
+            log_event(f"⚠️ Skipped bad journal line in {os.path.basename(path)} after byte {offset}")
+    return records, offset + len(data)
+
+
+def tail(path: str, since: tuple[int | None, int]) -> tuple[list[dict], tuple] | None:
+    """Records appended after a cursor(), and the cursor to resume from.
+
+    If the journal was rotated since, the cursor's file is finished from
+    where it left off (in JOURNAL_ARCHIVE, or .compacting while a compaction
+    folds it), followed by every newer segment and the live file.
+    Returns None when that is impossible, e.g. the file is gone; the
+    caller then has to reload. Call with appends and rotation excluded
+    (archiving may run concurrently).
+    """
+    ino, offset = since
+    live = inode(path)
+    if ino is None:
+        # Nothing was on disk at the cursor; anything since may have been rotated away
+        return ([], since) if live is None else None
+    if ino == live:
+        records, offset = read_from(path, offset)
+        return records, (ino, offset)
+
+    # A compaction archives .compacting without the lock: start over if it moved
+    for _ in range(3):
+        compacting = inode(path + ".compacting")
+        segments = [p for p, _ in archived(path)] + [path + ".compacting"]
+        start = next((i for i in range(len(segments) - 1, -1, -1) if inode(segments[i]) == ino), None)
+        if start is not None:
+            records = read_from(segments[start], offset)[0]
+            for segment in segments[start + 1:]:
+                records += read_from(segment, 0)[0]
+        if inode(path + ".compacting") != compacting:
+            continue
+        if start is None:
+            return None
+        more, offset = read_from(path, 0)
+        return records + more, (live, offset)
+    return None
+
+
+def read_records(path: str = JOURNAL_FILE):
+    """Yield parsed records from a journal file, skipping torn lines."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        lines = f.readlines()
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record.get("u"), list):
+                raise ValueError("missing entries")
+        except (json.JSONDecodeError, ValueError, AttributeError) as e:
+            log_event(f"⚠️ Skipped bad journal line {os.path.basename(path)}:{lineno}: {e}")
+            continue
+        yield record
+
+
+def replay(scores: list[dict], records) -> int:
+    """Upsert every journalled entry into scores; return records applied."""
+    positions = {e.get("user_id"): i for i, e in enumerate(scores)}
+    applied = 0
+    for record in records:
+        for entry in record["u"]:
+            if not isinstance(entry, dict) or not isinstance(entry.get("user_id"), str):
+                continue
+            idx = positions.get(entry["user_id"])
+            if idx is None:
+                positions[entry["user_id"]] = len(scores)
+                scores.append(entry)
+            else:
+                scores[idx] = entry
+        applied += 1
+    return applied
+
+
+def pending_paths(path: str = JOURNAL_FILE) -> list[str]:
+    """Journal files to replay on top of the snapshot, oldest first."""
+    return [p for p in (path + ".compacting", path) if size(p)]
+
+
+def rotate(path: str = JOURNAL_FILE) -> bool:
+    """Move the live journal aside so appends start on a fresh file.
+
+    The fresh file is created right away, so a worker that tails it before
+    the next append still gets a cursor that survives the next rotation.
+    """
+    compacting = path + ".compacting"
+    if not size(path):
+        return False
+    if os.path.exists(compacting):
+        # A previous compaction died mid-way; fold both into one file.
+        with open(compacting, "a") as dst, open(path, "r") as src:
+            dst.write(src.read())
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(path)
+    else:
+        os.replace(path, compacting)
+    open(path, "ab").close()
+    return True
+
+
+def archive_rotated(path: str = JOURNAL_FILE) -> None:
+    """Retire the rotated journal once its records are in a snapshot.
+
+    The file is kept in JOURNAL_ARCHIVE as <name>.<unix time sealed>.
+    """
+    try:
+        os.makedirs(JOURNAL_ARCHIVE, exist_ok=True)
+        sealed = os.path.join(JOURNAL_ARCHIVE, f"{os.path.basename(path)}.{time.time():.6f}")
+        os.replace(path + ".compacting", sealed)
+    except FileNotFoundError:
+        pass
+
+
+def archived(path: str = JOURNAL_FILE) -> list[tuple[str, float]]:
+    """Archived segments of a journal as (file, sealed at), oldest first."""
+    prefix = os.path.basename(path) + "."
+    try:
+        names = os.listdir(JOURNAL_ARCHIVE)
+    except FileNotFoundError:
+        return []
+    segments = []
+    for name in names:
+        if name.startswith(prefix):
+            try:
+                segments.append((os.path.join(JOURNAL_ARCHIVE, name), float(name[len(prefix):])))
+            except ValueError:
+                continue
+    return sorted(segments, key=lambda s: s[1])
+
+
+def prune_archive(before: float) -> int:
+    """Delete archived segments sealed before the given unix time."""
+    removed = 0
+    try:
+        names = os.listdir(JOURNAL_ARCHIVE)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        try:
+            sealed = float(name.rsplit(".", 2)[-2] + "." + name.rsplit(".", 2)[-1])
+        except (ValueError, IndexError):
+            continue
+        if sealed < before:
+            os.remove(os.path.join(JOURNAL_ARCHIVE, name))
+            removed += 1
+    return removed
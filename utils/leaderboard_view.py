@@ -0,0 +1,90 @@
+# utils/leaderboard_view.py
+"""
+Materialised leaderboard: an immutable, pre-sorted array of
+(user_id, display_name, score) rows tagged with the store version it
+reflects, and with the shared data version, which HTTP validators for
+responses rendered from it must use.
+
+utils.storage publishes a new LeaderboardSnapshot by swapping one module
+reference, so readers just take the current object and never lock. A new
+snapshot is either patched from the previous one (copy the arrays, move
+the few users that changed) or rebuilt from the rank index.
+"""
+from bisect import bisect_left, bisect_right
+
+
+def display_name(entry: dict) -> str:
+    return entry.get("first_name") or entry.get("last_name") or entry.get("username") or "Anonymous"
+
+
+class LeaderboardSnapshot:
+    """One version of the leaderboard. Never mutated after construction."""
+
+    __slots__ = ("version", "built_at", "data_version", "rows", "_keys", "_positions")
+
+    def __init__(self, version: int, built_at: float, keys: list[tuple], rows: list[tuple],
+                 data_version: str | None = None):
+        self.version = version
+        self.built_at = built_at
+        self.data_version = data_version  # storage.data_version() the rows were built from
+        self.rows = rows        # (user_id, display_name, score), rank order
+        self._keys = keys       # RankIndex keys (-score, seq, user_id), same order
+        self._positions = None  # user_id -> index, built on first rank_of()
+
+    @classmethod
+    def build(cls, version, built_at, keys, name_of, data_version=None):
+        rows = [(uid, name_of(uid), -neg) for neg, _, uid in keys]
+        return cls(version, built_at, keys, rows, data_version)
+
+    def patch(self, version, built_at, moves, name_of, data_version=None):
+        """Copy with users moved; moves maps user_id -> (old key, new key), either may be None."""
+        keys, rows = list(self._keys), list(self.rows)
+        for old, _ in moves.values():
+            if old is not None:
+                i = bisect_left(keys, old)
+                if i < len(keys) and keys[i] == old:
+                    del keys[i], rows[i]
+        for uid, (_, new) in moves.items():
+            if new is not None:
+                i = bisect_left(keys, new)
+                keys.insert(i, new)
+                rows.insert(i, (uid, name_of(uid), -new[0]))
+        return LeaderboardSnapshot(version, built_at, keys, rows, data_version)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def page(self, start: int = 0, stop: int | None = None) -> list[tuple]:
+        return self.rows[start:stop]
+
+    def key_at(self, i: int) -> tuple:
+        """Sort key of row i; encodes a stable pagination cursor."""
+        return self._keys[i]
+
+    def index_after(self, key: tuple) -> int:
+        """Index of the first row ranked below key, in O(log n)."""
+        return bisect_right(self._keys, key)
+
+    def locate(self, user_id: str, key: tuple | None) -> int | None:
+        """Row index of a user, given their live rank key (None if unranked).
+
+        O(log n) unless the user moved since this snapshot was taken.
+        """
+        if key is None:
+            return None
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return i
+        rank = self.rank_of(user_id)
+        return None if rank is None else rank - 1
+
+    def rank_of(self, user_id: str) -> int | None:
+        """1-based rank of a user in this snapshot, or None if unranked."""
+        if self._positions is None:
+            # Racing readers may both build this; either result is the same
+            self._positions = {row[0]: i for i, row in enumerate(self.rows)}
+        i = self._positions.get(user_id)
+        return None if i is None else i + 1
+
+
+EMPTY = LeaderboardSnapshot(-1, 0.0, [], [])
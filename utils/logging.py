@@ -1,7 +1,8 @@
 import os
 from .timeutils import gmt4_timestamp
+from .paths import DATA_DIR
 
-LOG_FILE = "/app/data/logs.txt"
+LOG_FILE = os.path.join(DATA_DIR, "logs.txt")
 
 def log_event(message):
     timestamp = gmt4_timestamp()
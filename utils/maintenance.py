@@ -0,0 +1,179 @@
+# utils/maintenance.py
+"""
+One maintenance scheduler for every periodic job, whatever the worker count.
+
+Each worker process runs a scheduler thread, but jobs registered as shared
+(backups, pruning, compaction) only run in the leader: the process holding
+an exclusive flock on LEADER_FILE. When the leader exits the lock is freed
+and another worker takes over on its next tick. Per-worker jobs (cache
+warmup) run in every process.
+
+Jobs run one at a time on the scheduler thread, so they never overlap.
+Each run is scheduled interval + a random jitter after the previous one;
+shared jobs persist their last run in STATE_FILE so a restart or a new
+leader continues the schedule instead of starting it over.
+"""
+import os
+import json
+import time
+import fcntl
+import random
+import threading
+from .logging import log_event
+from .paths import DATA_DIR
+
+LEADER_FILE = os.path.join(DATA_DIR, ".maintenance.lock")
+STATE_FILE = os.path.join(DATA_DIR, "maintenance_state.json")
+TICK = 30  # seconds between leadership attempts when idle
+
+_jobs = {}              # name -> job dict, in registration order
+_lock = threading.Lock()
+_wake = threading.Event()
+_started = False
+_leader_fd = None
+_leader_pid = None
+
+
+def register(name, func, interval, jitter=None, every_worker=False, quiet=False):
+    """Run func() every interval seconds.
+
+    jitter defaults to 10% of the interval (at most 5 minutes). Set
+    every_worker for per-process work, quiet to log only failures.
+    """
+    with _lock:
+        _jobs[name] = {
+            "func": func,
+            "interval": interval,
+            "jitter": min(interval * 0.1, 300) if jitter is None else jitter,
+            "every_worker": every_worker,
+            "quiet": quiet,
+            "next_run": None,
+            "last_run": None,
+            "last_duration": None,
+            "last_ok": None,
+            "last_error": None,
+            "runs": 0,
+        }
+    _wake.set()
+
+
+def _is_leader() -> bool:
+    """Take (or keep) leadership without blocking."""
+    global _leader_fd, _leader_pid
+    if _leader_fd is not None and _leader_pid == os.getpid():
+        return True
+    # Own descriptor per process: flock is shared across a fork
+    os.makedirs(os.path.dirname(LEADER_FILE), exist_ok=True)
+    fd = os.open(LEADER_FILE, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return False
+    _leader_fd, _leader_pid = fd, os.getpid()
+    _load_state()
+    log_event(f"👑 Worker {os.getpid()} is now the maintenance leader")
+    return True
+
+
+def _load_state():
+    """Pick up last-run times of shared jobs from STATE_FILE."""
+    try:
+        with open(STATE_FILE, "r") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return
+    with _lock:
+        for name, job in _jobs.items():
+            saved = state.get(name)
+            if job["every_worker"] or not isinstance(saved, dict):
+                continue
+            for key in ("last_run", "last_duration", "last_ok", "last_error", "runs"):
+                job[key] = saved.get(key, job[key])
+            job["next_run"] = None
+
+
+def _save_state():
+    with _lock:
+        state = {
+            name: {k: job[k] for k in ("last_run", "last_duration", "last_ok", "last_error", "runs")}
+            for name, job in _jobs.items() if not job["every_worker"]
+        }
+    tmp = STATE_FILE + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATE_FILE)
+
+
+def _schedule(job, now):
+    if job["next_run"] is None:
+        base = job["last_run"] + job["interval"] if job["last_run"] else now
+        job["next_run"] = max(base, now) + random.uniform(0, job["jitter"])
+
+
+def _run(name, job):
+    started = time.time()
+    try:
+        job["func"]()
+        job["last_ok"], job["last_error"] = True, None
+    except Exception as e:
+        job["last_ok"], job["last_error"] = False, str(e)
+        log_event(f"❌ Maintenance job {name} failed: {e}")
+    duration = time.time() - started
+    with _lock:
+        job["last_run"], job["last_duration"] = started, round(duration, 3)
+        job["runs"] += 1
+        job["next_run"] = None
+    if job["last_ok"] and not job["quiet"]:
+        log_event(f"🛠️ Maintenance job {name} finished in {duration:.2f}s")
+    if not job["every_worker"]:
+        _save_state()
+
+
+def _loop():
+    while True:
+        try:
+            leader = _is_leader()
+        except OSError as e:
+            log_event(f"⚠️ Maintenance leader check failed: {e}")
+            leader = False
+        now = time.time()
+        wait = TICK
+        with _lock:
+            jobs = list(_jobs.items())
+        for name, job in jobs:
+            if not (leader or job["every_worker"]):
+                continue
+            with _lock:
+                _schedule(job, now)
+            if job["next_run"] <= time.time():
+                _run(name, job)
+                with _lock:
+                    _schedule(job, time.time())
+            wait = min(wait, job["next_run"] - time.time())
+        _wake.wait(max(wait, 0.05))
+        _wake.clear()
+
+
+def start():
+    """Start this process's scheduler thread (once)."""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_loop, name="maintenance", daemon=True).start()
+    log_event(f"🗓️ Maintenance scheduler started with {len(_jobs)} jobs")
+
+
+def stats() -> dict:
+    """Leadership and per-job schedule, last run and duration."""
+    with _lock:
+        return {
+            "leader": _leader_fd is not None and _leader_pid == os.getpid(),
+            "pid": os.getpid(),
+            "jobs": {
+                name: {k: v for k, v in job.items() if k != "func"}
+                for name, job in _jobs.items()
+            },
+        }
@@ -0,0 +1,5 @@
+# utils/paths.py
+"""Where the app keeps its data: the mounted volume in production."""
+import os
+
+DATA_DIR = os.getenv("DATA_DIR", "/app/data")
@@ -0,0 +1,114 @@
+# utils/ranking.py
+"""
+Incrementally maintained leaderboard order.
+
+Only users with score > 0 are ranked, highest first. Ties keep insertion
+order (the position in scores.json), which is what the old
+``sorted(..., reverse=True)`` calls produced.
+"""
+import threading
+from sortedcontainers import SortedList
+
+
+class RankIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = SortedList()   # (-score, seq, user_id)
+        self._key_of = {}           # user_id -> key currently in _keys
+        self._seq_of = {}           # user_id -> insertion order
+        self._next_seq = 0
+
+    def rebuild(self, scores: list[dict]) -> None:
+        """Reindex a whole score list in O(n log n)."""
+        with self._lock:
+            self._seq_of = {}
+            self._key_of = {}
+            keys = []
+            for seq, entry in enumerate(scores):
+                uid = entry["user_id"]
+                if uid in self._seq_of:
+                    continue
+                self._seq_of[uid] = seq
+                score = entry.get("score", 0)
+                if score > 0:
+                    key = (-score, seq, uid)
+                    self._key_of[uid] = key
+                    keys.append(key)
+            self._next_seq = len(scores)
+            self._keys = SortedList(keys)
+
+    def update(self, user_id: str, score: int) -> None:
+        """Record a user's current score in O(log n)."""
+        with self._lock:
+            seq = self._seq_of.get(user_id)
+            if seq is None:
+                seq = self._seq_of[user_id] = self._next_seq
+                self._next_seq += 1
+
+            old = self._key_of.get(user_id)
+            if old is not None:
+                if old[0] == -score:
+                    return
+                self._keys.remove(old)
+                del self._key_of[user_id]
+
+            if score > 0:
+                key = (-score, seq, user_id)
+                self._keys.add(key)
+                self._key_of[user_id] = key
+
+    def lookup(self, user_id: str) -> dict | None:
+        """Return rank, score and the next-higher score for a ranked user."""
+        with self._lock:
+            key = self._key_of.get(user_id)
+            if key is None:
+                return None
+            idx = self._keys.index(key)
+            next_score = -self._keys[idx - 1][0] if idx > 0 else None
+            return {"rank": idx + 1, "score": -key[0], "next_score": next_score}
+
+    def lookup_many(self, user_ids: list[str]) -> list[dict | None]:
+        """lookup() for each id, all against the same state of the index."""
+        with self._lock:
+            results = []
+            for user_id in user_ids:
+                key = self._key_of.get(user_id)
+                if key is None:
+                    results.append(None)
+                    continue
+                idx = self._keys.index(key)
+                next_score = -self._keys[idx - 1][0] if idx > 0 else None
+                results.append({"rank": idx + 1, "score": -key[0], "next_score": next_score})
+            return results
+
+    def key(self, user_id: str) -> tuple | None:
+        """The user's sort key (-score, seq, user_id), or None if unranked."""
+        with self._lock:
+            return self._key_of.get(user_id)
+
+    def keys(self) -> list[tuple]:
+        """Every sort key in leaderboard order (a copy)."""
+        with self._lock:
+            return list(self._keys)
+
+    def key_slice(self, start: int = 0, stop: int | None = None) -> list[tuple]:
+        """Sort keys ranked start..stop (0-based, stop exclusive)."""
+        with self._lock:
+            return list(self._keys.islice(start, stop))
+
+    def key_at(self, i: int) -> tuple:
+        with self._lock:
+            return self._keys[i]
+
+    def index_after(self, key: tuple) -> int:
+        """Index of the first key ranked below key."""
+        with self._lock:
+            return self._keys.bisect_right(key)
+
+    def user_ids(self, start: int = 0, stop: int | None = None) -> list[str]:
+        """User ids ranked start..stop (0-based, stop exclusive)."""
+        with self._lock:
+            return [key[2] for key in self._keys.islice(start, stop)]
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -0,0 +1,108 @@
+# utils/snapshot_index.py
+"""
+Indexed snapshot layout that can be memory-mapped and read one user at a time.
+
+    MAGIC
+    <count: u64> <data_start: u64>
+    count x <user_id hash: u64> <offset: u64> <length: u32> <score: i64>   (sorted by hash)
+    one compact JSON line per entry, in the original list order
+
+A lookup binary-searches the fixed-size table inside the mapping and decodes
+only the matching line, so reading a user does not materialise anybody
+else's referrals. A full decode just walks the JSON lines.
+"""
+import os
+import json
+import mmap
+import struct
+import zlib
+from bisect import bisect_left
+
+INDEXED_MAGIC = b"DRIDX1\n"
+_HEADER = struct.Struct("<QQ")
+_ROW = struct.Struct("<QQIq")
+
+
+def _hash(user_id: str) -> int:
+    # crc32 of the id and of its reverse: stable across processes, cheap, 64-bit
+    raw = user_id.encode()
+    return (zlib.crc32(raw) << 32) | zlib.crc32(raw[::-1])
+
+
+def encode_indexed(scores: list[dict]) -> bytes:
+    lines, rows, offset = [], [], 0
+    for entry in scores:
+        line = json.dumps(entry, separators=(",", ":")).encode() + b"\n"
+        rows.append((_hash(entry["user_id"]), offset, len(line), entry.get("score", 0)))
+        lines.append(line)
+        offset += len(line)
+    rows.sort(key=lambda row: row[0])
+
+    data_start = len(INDEXED_MAGIC) + _HEADER.size + len(rows) * _ROW.size
+    parts = [INDEXED_MAGIC, _HEADER.pack(len(rows), data_start)]
+    parts.extend(_ROW.pack(*row) for row in rows)
+    parts.extend(lines)
+    return b"".join(parts)
+
+
+def decode_indexed(data: bytes) -> list[dict]:
+    _, data_start = _HEADER.unpack_from(data, len(INDEXED_MAGIC))
+    return [json.loads(line) for line in data[data_start:].splitlines()]
+
+
+class _Hashes:
+    """Sequence view of the table's hash column, for bisect."""
+
+    def __init__(self, buf, count):
+        self._buf = buf
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return _ROW.unpack_from(self._buf, len(INDEXED_MAGIC) + _HEADER.size + i * _ROW.size)[0]
+
+
+class IndexedSnapshot:
+    """Read-only mmap view of an indexed snapshot file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(INDEXED_MAGIC)] != INDEXED_MAGIC:
+            self._map.close()
+            raise ValueError(f"{os.path.basename(path)} is not an indexed snapshot")
+        self._count, self._data_start = _HEADER.unpack_from(self._map, len(INDEXED_MAGIC))
+        self._hashes = _Hashes(self._map, self._count)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, user_id: str) -> dict | None:
+        """Decode and return one user's entry, or None."""
+        h = _hash(user_id)
+        i = bisect_left(self._hashes, h)
+        while i < self._count:
+            row_hash, offset, length, _ = _ROW.unpack_from(
+                self._map, len(INDEXED_MAGIC) + _HEADER.size + i * _ROW.size
+            )
+            if row_hash != h:
+                break
+            start = self._data_start + offset
+            entry = json.loads(self._map[start:start + length])
+            if entry.get("user_id") == user_id:
+                return entry
+            i += 1
+        return None
+
+    def __iter__(self):
+        """Decode entries lazily in their original order."""
+        pos, end = self._data_start, len(self._map)
+        while pos < end:
+            nl = self._map.find(b"\n", pos)
+            yield json.loads(self._map[pos:nl])
+            pos = nl + 1
+
+    def close(self) -> None:
+        self._map.close()
@@ -0,0 +1,290 @@
+# utils/snapshot_io.py
+"""
+Reading and writing score snapshots: scores.json, backups and shard files.
+
+Shared by utils.storage and the backends in utils.backends, which must not
+import utils.storage (it imports them). Backup restore on a corrupt
+scores.json needs the backup catalog, so storage registers it here.
+"""
+import os
+import json
+import fcntl
+import time
+import threading
+import hashlib
+from collections import deque
+from .logging import log_event
+from .paths import DATA_DIR
+from . import journal, backup_store
+from .snapshot_index import INDEXED_MAGIC, encode_indexed, decode_indexed
+
+try:
+    import msgpack
+except ImportError:  # optional; snapshots fall back to JSON without it
+    msgpack = None
+
+SCORES_FILE = os.path.join(DATA_DIR, "scores.json")
+SCORES_META = SCORES_FILE + ".meta"   # hash/count of the committed snapshot, for backups
+BACKUP_FOLDER = os.path.join(DATA_DIR, "backups")
+SHARD_BACKUP_FOLDER = os.path.join(BACKUP_FOLDER, "shards")
+SCORES_FORMAT = os.getenv("SCORES_FORMAT", "json")    # "json", "msgpack" or "indexed"
+
+# Parsed-snapshot cache for SCORES_FILE, keyed on (st_ino, st_mtime_ns, st_size)
+SNAPSHOT_CACHE = os.getenv("SCORES_SNAPSHOT_CACHE", "1") != "0"
+_snapshot_lock = threading.Lock()
+_snapshot_key = None
+_snapshot_scores = None     # validated list, filled by readonly loads; dropped when a writer takes it
+_snapshot_stats = {"hit": 0, "miss": 0}
+_snapshot_events = deque()  # (time, "hit" | "miss") over the last minute
+_restore = None             # () -> list restored from backups, or None; see register_restore()
+
+# --------------------- Validators ---------------------
+def validate_scores(scores):
+    if not isinstance(scores, list):
+        return False
+    for entry in scores:
+        if not isinstance(entry, dict):
+            return False
+        if "user_id" not in entry or not isinstance(entry["user_id"], str):
+            return False
+        if "score" in entry and not isinstance(entry["score"], int):
+            return False
+        if "tasks_done" in entry and not isinstance(entry["tasks_done"], list):
+            return False
+    return True
+
+# --------------------- Serializers ---------------------
+MSGPACK_MAGIC = b"DRMPK1\n"   # header that marks a msgpack snapshot
+SNAPSHOT_EXTENSIONS = {"json": ".json", "msgpack": ".msgpack", "indexed": ".idx"}
+DECODE_ERRORS = (ValueError, TypeError) + ((msgpack.UnpackException,) if msgpack else ())
+
+def snapshot_format():
+    """Format used for new snapshots and backups."""
+    if SCORES_FORMAT == "msgpack" and msgpack is None:
+        return "json"
+    return SCORES_FORMAT if SCORES_FORMAT in SNAPSHOT_EXTENSIONS else "json"
+
+def is_snapshot_file(filename):
+    return filename.endswith(tuple(SNAPSHOT_EXTENSIONS.values()))
+
+def encode_scores(scores, fmt=None) -> bytes:
+    """Serialise a score list; JSON is compact unless fmt="json-pretty"."""
+    fmt = fmt or snapshot_format()
+    if fmt == "msgpack":
+        return MSGPACK_MAGIC + msgpack.packb(scores, use_bin_type=True)
+    if fmt == "indexed":
+        return encode_indexed(scores)
+    if fmt == "json-pretty":
+        return json.dumps(scores, indent=2).encode()
+    return json.dumps(scores, separators=(",", ":")).encode()
+
+def decode_scores(data: bytes):
+    """Parse a snapshot in any supported format, detected from its header."""
+    if data.startswith(MSGPACK_MAGIC):
+        if msgpack is None:
+            raise ValueError("msgpack snapshot found but msgpack is not installed")
+        return msgpack.unpackb(data[len(MSGPACK_MAGIC):], raw=False)
+    if data.startswith(INDEXED_MAGIC):
+        return decode_indexed(data)
+    if not data.strip():
+        raise json.JSONDecodeError("File is empty", "", 0)
+    return json.loads(data)
+
+def read_snapshot(path):
+    """Read and decode a snapshot/backup file, a sharded backup manifest or a delta chain."""
+    with open(path, "rb") as f:
+        data = decode_scores(f.read())
+    if backup_store.is_manifest(data):
+        if data["kind"] == "records":
+            return backup_store.read_records(data)
+        return decode_scores(backup_store.read_bytes(data))
+    if isinstance(data, dict) and data.get("format") == "delta":
+        scores = read_snapshot(os.path.join(os.path.dirname(path), data["base"]))
+        journal.replay(scores, [{"u": data["users"]}])
+        return scores
+    if isinstance(data, dict) and data.get("format") == "sharded":
+        scores = []
+        for i in range(data["shards"]):
+            scores.extend(read_snapshot(os.path.join(SHARD_BACKUP_FOLDER, data["files"][str(i)])))
+        return scores
+    return data
+
+# --------------------- File I/O ------------------------
+def ensure_file():
+    if not os.path.exists(SCORES_FILE):
+        os.makedirs(os.path.dirname(SCORES_FILE), exist_ok=True)
+        with open(SCORES_FILE, "w") as f:
+            json.dump([], f)
+        log_event("✅ Created new scores.json")
+
+# --------------------- Snapshot cache ------------------
+def register_restore(func) -> None:
+    """Declare how to recover scores.json from backups when it does not parse.
+
+    func() commits and returns the restored list, or returns None.
+    """
+    global _restore
+    _restore = func
+
+def _count_snapshot(kind):
+    now = time.time()
+    with _snapshot_lock:
+        _snapshot_stats[kind] += 1
+        _snapshot_events.append((now, kind))
+        while _snapshot_events and now - _snapshot_events[0][0] > 60:
+            _snapshot_events.popleft()
+
+def invalidate_snapshot_cache():
+    """Forget the cached parse of SCORES_FILE (called on every write)."""
+    global _snapshot_key, _snapshot_scores
+    with _snapshot_lock:
+        _snapshot_key = None
+        _snapshot_scores = None
+
+def snapshot_cache_stats():
+    """Hit/miss totals plus the counts over the last minute."""
+    now = time.time()
+    with _snapshot_lock:
+        recent = [kind for ts, kind in _snapshot_events if now - ts <= 60]
+        return {
+            "enabled": SNAPSHOT_CACHE,
+            "hits": _snapshot_stats["hit"],
+            "misses": _snapshot_stats["miss"],
+            "hits_last_minute": recent.count("hit"),
+            "misses_last_minute": recent.count("miss"),
+        }
+
+def load_snapshot(readonly=False):
+    """Parse SCORES_FILE, reusing the last parse if the file is unchanged.
+
+    Only readonly callers (exports and admin views in a process without the
+    store loaded) fill the cache; they share the list and must not mutate
+    it. Anyone else owns what they get: a cached parse is handed over and
+    dropped from the cache, so the store is never held twice.
+    """
+    global _snapshot_key, _snapshot_scores
+    ensure_file()
+
+    # === Try to load and parse scores.json
+    try:
+        with open(SCORES_FILE, "rb") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            st = os.fstat(f.fileno())
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+            with _snapshot_lock:
+                cached = _snapshot_scores if SNAPSHOT_CACHE and key == _snapshot_key else None
+            content = f.read() if cached is None else None
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+        if cached is not None:
+            _count_snapshot("hit")
+            if not readonly:
+                invalidate_snapshot_cache()
+            return cached
+
+        _count_snapshot("miss")
+        scores = decode_scores(content)
+
+        if not validate_scores(scores):
+            raise ValueError("Invalid format")
+
+        if SNAPSHOT_CACHE and readonly:
+            with _snapshot_lock:
+                _snapshot_key, _snapshot_scores = key, scores
+        return scores
+
+    except DECODE_ERRORS as e:
+        log_event(f"❌ Failed to load valid scores.json: {e} — attempting backup restore")
+
+    restored = _restore() if _restore else None
+    return restored if restored is not None else []
+
+def atomic_write(path: str, data: str | bytes):
+    """Write data to path atomically using Railway-compatible tmp file."""
+    tmp_path = path + ".tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(tmp_path, "wb" if isinstance(data, bytes) else "w") as tmp:
+        tmp.write(data)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+    os.replace(tmp_path, path)
+
+FICLONE = 0x40049409  # linux/fs.h: share extents with another file (reflink)
+
+def copy_file(src_fd, dest):
+    """Copy an open file to dest atomically without moving it through Python.
+
+    Tries a reflink, then copy_file_range, then sendfile.
+    """
+    tmp_path = dest + ".tmp"
+    size = os.fstat(src_fd).st_size
+    with open(tmp_path, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src_fd)
+        except OSError:
+            offset = 0
+            use_range = hasattr(os, "copy_file_range")
+            while offset < size:
+                if use_range:
+                    try:
+                        n = os.copy_file_range(src_fd, dst.fileno(), size - offset, offset, offset)
+                    except OSError:
+                        if offset:
+                            raise
+                        use_range = False  # e.g. EXDEV on older kernels
+                        continue
+                else:
+                    dst.seek(offset)
+                    n = os.sendfile(dst.fileno(), src_fd, offset, size - offset)
+                if n == 0:
+                    raise IOError(f"short copy: {offset} of {size} bytes")
+                offset += n
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, dest)
+
+def commit_snapshot(data: bytes, count: int):
+    """Write SCORES_FILE plus the metadata backups reuse instead of re-reading it."""
+    atomic_write(SCORES_FILE, data)
+    st = os.stat(SCORES_FILE)
+    meta = {
+        "key": [st.st_ino, st.st_mtime_ns, st.st_size],
+        "format": snapshot_format(),
+        "records": count,
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+    atomic_write(SCORES_META, json.dumps(meta))
+    invalidate_snapshot_cache()
+
+def committed_meta(st):
+    """Metadata of the snapshot whose stat is st, or None if unknown or stale."""
+    try:
+        with open(SCORES_META, "r") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("key") == [st.st_ino, st.st_mtime_ns, st.st_size] else None
+
+def write_scores_file(scores):
+    if not validate_scores(scores):
+        log_event("❌ Invalid scores format — skipping save.")
+        return False
+
+    os.makedirs(os.path.dirname(SCORES_FILE), exist_ok=True)
+
+    tmp_path = SCORES_FILE + ".tmp"
+    try:
+        with open(SCORES_FILE, "a+") as lock_f:
+            fcntl.flock(lock_f, fcntl.LOCK_EX)
+            commit_snapshot(encode_scores(scores), len(scores))
+            fcntl.flock(lock_f, fcntl.LOCK_UN)
+        log_event("✅ Successfully saved scores.json")
+        return True
+    except Exception as e:
+        log_event(f"❌ Failed to save scores.json directly: {e}")
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except Exception:
+            pass
+        return False
@@ -1,183 +1,898 @@
 import os
-import json
-import fcntl
 import time
+import fcntl
 import threading
 import hashlib
+from contextlib import contextmanager
 from datetime import datetime
 from .logging import log_event
-from .timeutils import gmt4_now, gmt4_timestamp
+from .paths import DATA_DIR
+from .timeutils import GMT4_TZ, gmt4_now, gmt4_timestamp
+from . import journal, coherence, backup_catalog, backup_store
+from .ranking import RankIndex
+from .leaderboard_view import EMPTY as EMPTY_BOARD, LeaderboardSnapshot, display_name
+from . import windows
+from .snapshot_io import (  # also re-exported for routes and benchmarks
+    SCORES_FILE, BACKUP_FOLDER, SHARD_BACKUP_FOLDER, SNAPSHOT_EXTENSIONS, DECODE_ERRORS, msgpack,
+    validate_scores, snapshot_format, is_snapshot_file, encode_scores, decode_scores, read_snapshot,
+    snapshot_cache_stats, atomic_write, copy_file, commit_snapshot, committed_meta,
+)
+from . import snapshot_io
+from .backends import SqliteBackend, JsonBackend, ShardedJsonBackend
 
-SCORES_FILE = "/app/data/scores.json"
-BACKUP_FOLDER = "/app/data/backups"
+SCORES_DB = os.path.join(DATA_DIR, "scores.db")
+SCORES_BACKEND = os.getenv("SCORES_BACKEND", "json")  # "json", "sharded" or "sqlite"
+SHARD_FOLDER = os.path.join(DATA_DIR, "scores")      # used by SCORES_BACKEND=sharded
+SCORES_SHARDS = int(os.getenv("SCORES_SHARDS", "16"))
 _last_backup_time = 0
 
-# --------------------- Validators ---------------------
-def validate_scores(scores):
-    if not isinstance(scores, list):
-        return False
+# Backup mode: "full" copies everything each time; "delta" writes a full base
+# every BACKUP_FULL_EVERY backups and per-user changes against the previous
+# backup in between; "cas" stores compressed chunks plus a manifest, reusing
+# blocks unchanged since an earlier backup (see utils.backup_store).
+BACKUP_MODE = os.getenv("SCORES_BACKUP_MODE", "full")
+BACKUP_FULL_EVERY = int(os.getenv("SCORES_BACKUP_FULL_EVERY", "12"))
+BACKUP_RETENTION_DAYS = float(os.getenv("SCORES_BACKUP_RETENTION_DAYS", "21"))
+backup_store.register_folder(BACKUP_FOLDER)
+
+# Compaction settings: mutations go to the journal; the maintenance leader
+# compacts every COMPACT_INTERVAL, any worker sooner past COMPACT_THRESHOLD
+COMPACT_INTERVAL = float(os.getenv("SCORES_COMPACT_INTERVAL", "60"))      # seconds
+COMPACT_THRESHOLD = int(os.getenv("SCORES_COMPACT_THRESHOLD", "5000"))    # journal records
+
+_store_lock = threading.RLock()
+_lock_depth = 0         # scores_lock() nesting in the thread holding _store_lock
+COMPACT_LOCK_FILE = os.path.join(DATA_DIR, ".scores.compact.lock")
+_compact_lock = threading.Lock()  # with COMPACT_LOCK_FILE: one compaction or replace at a time
+_unjournaled = False    # a journal append failed: some changes only exist in memory
+_seen = (0, 0, 0)       # coherence (generation, epoch, replaced) this process has caught up to
+_data_seen = None       # data_version() the in-memory store reflects
+_backend = None         # ScoreBackend, created on first use
+_scores = None          # authoritative list, loaded once per process
+_index = {}             # user_id -> entry in _scores
+_ranks = RankIndex()    # leaderboard order of _scores
+_windows = windows.WindowedRanks()  # per-window order for the current periods
+_version = 0            # bumped on every mutation of the store
+_flushed_version = 0    # _version covered by the last compaction
+_backup_version = None  # data_version() captured by the last backup
+_backup_changed = None  # user_id -> None, changed since the last backup (ordered); None forces a full one
+_backup_chain = (None, 0)  # (last backup file, deltas written on top of its base)
+_compactor_started = False
+_compact_now = threading.Event()
+
+# Materialised leaderboard (see utils.leaderboard_view)
+LEADERBOARD_DEBOUNCE = float(os.getenv("LEADERBOARD_DEBOUNCE", "0.5"))  # seconds between refreshes
+BOARD_PATCH_LIMIT = 2000    # moved users above which a refresh rebuilds instead of patching
+_board = EMPTY_BOARD        # current LeaderboardSnapshot; replaced, never mutated
+_board_lock = threading.Lock()
+_board_moves = None         # user_id -> rank key in _board, for users changed since; None forces a rebuild
+_board_dirty_since = None   # time of the oldest change _board does not reflect
+_board_stats = {"rebuilds": 0, "patches": 0, "last_ms": None, "max_ms": 0.0}
+
+def load_scores(readonly=False):
+    """Read the full score list from the configured backend.
+
+    Pass readonly=True to share the cached parse instead of getting a copy.
+    """
+    return get_backend().load(readonly=readonly)
+
+# --------------------- Backends ------------------------
+def prune_backup_shards():
+    """Delete shard backup files no manifest refers to any more."""
+    if not os.path.isdir(SHARD_BACKUP_FOLDER):
+        return 0
+    referenced = set()
+    for record in list_backups():
+        f = record["file"]
+        if not f.endswith(".json") or record["format"] not in ("sharded", None):
+            continue
+        try:
+            with open(os.path.join(BACKUP_FOLDER, f), "rb") as fh:
+                data = decode_scores(fh.read())
+            if isinstance(data, dict) and data.get("format") == "sharded":
+                referenced.update(data["files"].values())
+        except Exception:
+            continue
+    removed = 0
+    for name in os.listdir(SHARD_BACKUP_FOLDER):
+        if name not in referenced:
+            os.remove(os.path.join(SHARD_BACKUP_FOLDER, name))
+            removed += 1
+    return removed
+
+def get_backend():
+    """Return the process-wide backend selected by SCORES_BACKEND."""
+    global _backend
+    with _store_lock:
+        if _backend is None:
+            if SCORES_BACKEND == "sqlite":
+                _backend = SqliteBackend(SCORES_DB)
+            elif SCORES_BACKEND == "sharded":
+                _backend = ShardedJsonBackend(SHARD_FOLDER, SCORES_SHARDS, SHARD_BACKUP_FOLDER)
+            else:
+                _backend = JsonBackend()
+            log_event(f"🗄️ Using {_backend.name} score backend")
+        return _backend
+
+# --------------------- In-memory store -----------------
+def _build_index(scores):
+    index = {}
     for entry in scores:
-        if not isinstance(entry, dict):
-            return False
-        if "user_id" not in entry or not isinstance(entry["user_id"], str):
-            return False
-        if "score" in entry and not isinstance(entry["score"], int):
-            return False
-        if "tasks_done" in entry and not isinstance(entry["tasks_done"], list):
+        index.setdefault(entry["user_id"], entry)  # first match wins, like the old scans
+    return index
+
+def _load_store():
+    """(Re)load everything from the backend. Caller holds scores_lock()."""
+    global _scores, _index, _seen, _data_seen, _backup_changed, _board_moves
+    seen, data_seen = coherence.read(), data_version()[0]
+    _scores = load_scores()
+    _backup_changed = None
+    _track_board(())
+    _board_moves = None
+    _index = _build_index(_scores)
+    _ranks.rebuild(_scores)
+    _windows.rebuild(_scores, windows.period_keys(time.time()))
+    get_backend().reset_cursor()
+    _seen, _data_seen = seen, data_seen
+
+def _apply_remote(entries):
+    """Upsert entries journalled by other workers into the store."""
+    global _version, _flushed_version
+    _track_backup(entries)
+    _track_board(entries)
+    keys = windows.period_keys(time.time())
+    clean = _version == _flushed_version
+    for entry in entries:
+        if not isinstance(entry, dict) or not isinstance(entry.get("user_id"), str):
+            continue
+        current = _index.get(entry["user_id"])
+        if current is None:
+            _scores.append(entry)
+            _index[entry["user_id"]] = entry
+        else:
+            # In place, never emptied: request threads read entries without the lock
+            current.update(entry)
+            for key in [k for k in current if k not in entry]:
+                del current[key]
+        _ranks.update(entry["user_id"], entry.get("score", 0))
+        _windows.update(entry, keys)
+    _version += 1
+    if clean:
+        _flushed_version = _version  # the writer compacts its own changes
+
+def _track_backup(entries):
+    """Remember which users the next delta backup has to include."""
+    if _backup_changed is not None:
+        for entry in entries:
+            if isinstance(entry, dict) and isinstance(entry.get("user_id"), str):
+                _backup_changed[entry["user_id"]] = None
+
+def _track_board(entries):
+    """Note users about to move on the leaderboard; call before _ranks.update()."""
+    global _board_dirty_since
+    if _board_dirty_since is None:
+        _board_dirty_since = time.time()
+    if _board_moves is not None:
+        for entry in entries:
+            uid = entry.get("user_id") if isinstance(entry, dict) else None
+            if isinstance(uid, str) and uid not in _board_moves:
+                _board_moves[uid] = _ranks.key(uid)
+
+def _catch_up():
+    """Bring the store up to date with other workers. Caller holds scores_lock()."""
+    global _seen, _data_seen, _version, _flushed_version
+    if _scores is None:
+        return
+    seen = coherence.read()
+    if seen == _seen:
+        return
+    # A compaction (new epoch) only rotated the journal: keep tailing it.
+    # Replaced scores cannot be expressed as changes: reload.
+    changes = get_backend().pull_changes() if seen[2] == _seen[2] else None
+    if changes is None:
+        clean = _version == _flushed_version
+        _load_store()
+        _version += 1
+        if clean or not get_backend().has_pending():  # the reload is what is on disk
+            _flushed_version = _version
+        log_event(f"🔄 Reloaded {len(_scores)} users after another worker rewrote the store")
+    else:
+        if changes:
+            _apply_remote(changes)
+        if seen[1] != _seen[1] and not get_backend().has_pending():
+            _flushed_version = _version  # another worker compacted everything we hold
+        _data_seen = data_version()[0]
+    _seen = seen
+
+def _sync():
+    """Cheap per-read freshness check: one mmap read unless something changed."""
+    if _scores is None:
+        get_scores()
+    elif coherence.read() != _seen:
+        with scores_lock():
+            pass
+
+def get_scores():
+    """Return the process-resident score list, loading it from disk once."""
+    with scores_lock():
+        if _scores is None:
+            _load_store()
+        return _scores
+
+def iter_scores():
+    """Iterate every entry without building a merged list.
+
+    Uses the in-memory store once it is loaded; before that it streams from
+    the backend (shard by shard for the sharded layout).
+    """
+    if _scores is not None:
+        with scores_lock():
+            return iter(list(_scores))
+    return get_backend().iter_entries()
+
+def get_user(user_id):
+    """O(1) lookup of a user's entry in the store, or None."""
+    _sync()
+    return _index.get(user_id)
+
+def add_user(entry):
+    """Append a new entry to the store and index it. Caller journals it.
+
+    Ranking is left to save_entries(), which credits the starting score to
+    the entry's windows because the rank index does not know the user yet.
+    """
+    with scores_lock():
+        scores = get_scores()
+        scores.append(entry)
+        _index.setdefault(entry["user_id"], entry)
+        return entry
+
+def get_rank(user_id):
+    """Rank, score and next-higher score of a user, or None if unranked."""
+    _sync()
+    return _ranks.lookup(user_id)
+
+def get_ranks(user_ids, window=None):
+    """get_rank() (or get_window_rank()) for many users from one consistent
+    state of the rank index; O(log n) per id. Also returns the store version."""
+    _sync()
+    with _store_lock:
+        ranks = _windows.index(window, windows.period_keys(time.time())) if window else _ranks
+        return ranks.lookup_many(user_ids), _version
+
+def leaderboard_snapshot():
+    """Current LeaderboardSnapshot.
+
+    Refreshed at most every LEADERBOARD_DEBOUNCE seconds by whichever
+    reader finds it stale; everyone else keeps reading the previous one.
+    """
+    _sync()
+    board = _board
+    if board.version != _version and time.time() - board.built_at >= LEADERBOARD_DEBOUNCE:
+        if _board_lock.acquire(blocking=board is EMPTY_BOARD):
+            try:
+                board = _refresh_board()
+            finally:
+                _board_lock.release()
+    return board
+
+def _refresh_board():
+    """Publish a new snapshot. Only the inputs are captured under the lock;
+    users changed while rows are being built land in the next patch."""
+    global _board, _board_moves, _board_dirty_since
+    started = time.time()
+    with _store_lock:
+        version, data_seen, index, moves = _version, _data_seen, _index, _board_moves
+        if moves is not None and _board is not EMPTY_BOARD and len(moves) <= BOARD_PATCH_LIMIT:
+            moves, keys = {uid: (key, _ranks.key(uid)) for uid, key in moves.items()}, None
+        else:
+            keys = _ranks.keys()
+        _board_moves, _board_dirty_since = {}, None
+
+    name_of = lambda uid: display_name(index.get(uid) or {})
+    if keys is None:
+        board, kind = _board.patch(version, started, moves, name_of, data_seen), "patches"
+    else:
+        board, kind = LeaderboardSnapshot.build(version, started, keys, name_of, data_seen), "rebuilds"
+    _board = board
+    elapsed = (time.time() - started) * 1000
+    _board_stats[kind] += 1
+    _board_stats["last_ms"] = round(elapsed, 2)
+    _board_stats["max_ms"] = round(max(_board_stats["max_ms"], elapsed), 2)
+    return board
+
+def leaderboard_position(board, user_id):
+    """0-based row of user_id in a leaderboard snapshot or window board, or None if unranked."""
+    if isinstance(board, windows.WindowBoard):
+        return board.position(user_id)
+    return board.locate(user_id, _ranks.key(user_id))
+
+def window_board(name):
+    """Live ranking of one time window ("hourly", "daily", "weekly", "season")."""
+    _sync()
+    keys = windows.period_keys(time.time())
+    index = _index
+    return windows.WindowBoard(
+        name, keys[name], _windows.index(name, keys), _version,
+        lambda uid: display_name(index.get(uid) or {}),
+    )
+
+def get_window_rank(name, user_id):
+    """Like get_rank(), within the current period of a time window."""
+    _sync()
+    return _windows.index(name, windows.period_keys(time.time())).lookup(user_id)
+
+def leaderboard_stats():
+    """Refresh counts and timings, and how stale the current leaderboard is."""
+    now = time.time()
+    board = _board
+    return {
+        **_board_stats,
+        "version": board.version,
+        "store_version": _version,
+        "rows": len(board),
+        "age_seconds": round(now - board.built_at, 3) if board is not EMPTY_BOARD else None,
+        "staleness_seconds": round(now - _board_dirty_since, 3) if _board_dirty_since else 0.0,
+    }
+
+@contextmanager
+def scores_lock():
+    """Hold around read-modify-write sequences on the store.
+
+    Excludes other threads and, through a flock, other worker processes;
+    changes those workers made are applied before the block runs.
+    """
+    global _lock_depth
+    with _store_lock:
+        outermost = _lock_depth == 0
+        if outermost:
+            coherence.acquire()
+        _lock_depth += 1
+        try:
+            _catch_up()
+            yield
+        finally:
+            _lock_depth -= 1
+            if outermost:
+                coherence.release()
+
+def save_entries(op, *entries):
+    """Journal entries that were just mutated in the store.
+
+    op names the mutation ("register", "score", "referral", "task",
+    "subscription"). Cost is one appended line and one fsync, regardless of
+    how many users exist; the compactor folds the journal into scores.json.
+    """
+    global _version, _seen, _data_seen, _unjournaled
+    with scores_lock():
+        _track_backup(entries)
+        _track_board(entries)
+        keys = windows.period_keys(time.time())
+        for entry in entries:
+            # The rank index still holds the score this entry had when last saved
+            key = _ranks.key(entry["user_id"])
+            delta = entry.get("score", 0) - (-key[0] if key else 0)
+            if delta:
+                windows.add_gain(entry, delta, keys)
+            _ranks.update(entry["user_id"], entry.get("score", 0))
+            _windows.update(entry, keys)
+        try:
+            get_backend().append(op, list(entries))
+            _seen = coherence.bump()
+            _data_seen = data_version()[0]
+        except Exception as e:
+            log_event(f"❌ Failed to journal {op} mutation: {e} — forcing snapshot")
+            _unjournaled = True
+            _compact_now.set()
+        _version += 1
+        if _version - _flushed_version >= COMPACT_THRESHOLD:
+            _compact_now.set()
+
+def save_scores(scores):
+    """Persist a whole score list immediately (bulk edits, restores)."""
+    if scores is not _scores:
+        return replace_scores(scores)
+    flush_scores(force=True)
+    return True
+
+def replace_scores(scores):
+    """Swap in a whole new score list (restore/upload) and persist it now."""
+    global _scores, _index, _version, _flushed_version, _seen, _data_seen, _backup_changed, _board_moves
+    if not validate_scores(scores):
+        log_event("❌ Invalid scores format — skipping save.")
+        return False
+
+    with compaction_lock(), scores_lock():
+        _backup_changed = None  # users may have been removed; deltas cannot express that
+        backend = get_backend()
+        ok = backend.replace(scores)
+        backend.reset_cursor()
+        _seen = coherence.bump(replaced=True)  # other workers reload
+        if not ok:
             return False
+        _data_seen = data_version()[0]
+        _scores = scores
+        _index = _build_index(scores)
+        _track_board(())
+        _board_moves = None
+        _ranks.rebuild(scores)
+        _windows.rebuild(scores, windows.period_keys(time.time()))
+        _version += 1
+        _flushed_version = _version
+    # Checkpoint: point-in-time restores after this moment must start here,
+    # since the journal cannot express users the replace removed.
+    backup_scores(tag="replaced")
     return True
 
-# --------------------- File I/O ------------------------
-def ensure_file():
-    if not os.path.exists(SCORES_FILE):
-        os.makedirs(os.path.dirname(SCORES_FILE), exist_ok=True)
-        with open(SCORES_FILE, "w") as f:
-            json.dump([], f)
-        log_event("✅ Created new scores.json")
+def data_version():
+    """(version, last change time) of the scores, shared by every worker.
 
-def load_scores():
-    ensure_file()
+    One mmap read: cheap enough to answer conditional requests before
+    touching the store. The version is unique across data-directory wipes.
+    """
+    changes, nonce, changed_at = coherence.data_version()
+    return f"{nonce:x}-{changes}", changed_at
 
-    # === Try to load and parse scores.json
-    try:
-        with open(SCORES_FILE, "r") as f:
-            fcntl.flock(f, fcntl.LOCK_SH)
-            content = f.read()
-            fcntl.flock(f, fcntl.LOCK_UN)
+@contextmanager
+def compaction_lock():
+    """Run one compaction or replace at a time, across threads and workers.
+
+    Taken before scores_lock(), never inside it: a compaction releases the
+    store lock halfway through and takes it again at the end.
+    """
+    with _compact_lock:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with open(COMPACT_LOCK_FILE, "a") as lock_f:
+            fcntl.flock(lock_f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_f, fcntl.LOCK_UN)
 
-        if not content.strip():
-            raise json.JSONDecodeError("File is empty", content, 0)
+def flush_scores(force=False):
+    """Fold the journal into a fresh scores.json snapshot and archive it.
 
-        scores = json.loads(content)
+    Skips in O(1) when nothing changed since the last compaction. Only the
+    journal rotation happens under scores_lock(); the new snapshot is built
+    from the previous one plus the rotated segment and renamed into place
+    while writers carry on with the fresh journal. The store is not loaded
+    for this, so the leader's maintenance jobs do not make it resident.
+    """
+    global _flushed_version, _seen, _unjournaled
+    with compaction_lock():
+        with scores_lock():
+            backend = get_backend()
+            if _scores is None:
+                if not (force or backend.has_pending()):
+                    return
+            elif _version == _flushed_version and not force:
+                return
+            version = _version
+            if _unjournaled or not backend.folds_off_lock:
+                # Only the in-memory store has everything: write it out as is
+                scores = _scores if _scores is not None else backend.load()
+                ok = backend.compact(scores)
+                if backend.compact_rotates:
+                    backend.reset_cursor()
+                    _seen = coherence.bump(epoch=True, changed=False)  # workers follow the rotated journal
+                if ok:
+                    _flushed_version, _unjournaled = _version, False
+                return
+            sealed = backend.seal()
+            if sealed is None and not force:
+                _flushed_version = _version  # nothing left on disk to fold
+                return
+            if sealed is not None:
+                backend.reset_cursor()
+                _seen = coherence.bump(epoch=True, changed=False)  # workers follow the rotated journal
 
-        if not validate_scores(scores):
-            raise ValueError("Invalid format")
+        ok = backend.fold(sealed)
+        with scores_lock():
+            if ok:
+                _flushed_version = max(_flushed_version, version)
+                _seen = coherence.bump(epoch=True, changed=False)  # workers see the journal is folded
 
-        return scores
+def _compactor_loop():
+    while True:
+        _compact_now.wait()   # periodic compaction is the compact_scores maintenance job
+        _compact_now.clear()
+        try:
+            flush_scores()
+        except Exception as e:
+            log_event(f"❌ Journal compaction error: {e}")
 
-    except (json.JSONDecodeError, ValueError) as e:
-        log_event(f"❌ Failed to load valid scores.json: {e} — attempting backup restore")
-    
-    # === Try restore from latest modified backup (skip if also broken)
+def init_score_store():
+    """Load scores into memory and start the threshold-triggered compactor."""
+    global _compactor_started, _version
+    get_scores()
+    with scores_lock():
+        if _compactor_started:
+            return
+        _compactor_started = True
+        # Fold any journal left over from the previous run into a snapshot
+        if get_backend().has_pending():
+            _version += 1
+    threading.Thread(target=_compactor_loop, daemon=True).start()
+    log_event(f"🧠 Score store loaded ({len(_scores)} users, compaction every {COMPACT_INTERVAL}s)")
+
+def shutdown_score_store():
+    """Compact pending journal records; call on process exit."""
     try:
-        backups = sorted([
-            os.path.join(BACKUP_FOLDER, f)
-            for f in os.listdir(BACKUP_FOLDER)
-            if f.endswith(".json")
-        ], key=os.path.getmtime, reverse=True)
+        flush_scores()
+        log_event("💤 Score store flushed on shutdown")
+    except Exception as e:
+        log_event(f"❌ Failed to flush scores on shutdown: {e}")
 
-        for backup_path in backups:
+# --------------------- Backup catalog ------------------
+def _backup_tag(filename):
+    """Tag from leaderboard_backup_<date>_<time>[_<micros>][_<tag>].<ext>."""
+    rest = os.path.splitext(filename)[0].split("_")[4:]
+    if rest and rest[0].isdigit():
+        rest = rest[1:]
+    return "_".join(rest) or None
+
+def _scan_backups():
+    """Catalog records for whatever is in BACKUP_FOLDER (stat only, unvalidated)."""
+    records = []
+    try:
+        names = [f for f in os.listdir(BACKUP_FOLDER) if is_snapshot_file(f)]
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        st = os.stat(os.path.join(BACKUP_FOLDER, name))
+        records.append({
+            "file": name,
+            "created": st.st_mtime,
+            "timestamp": datetime.fromtimestamp(st.st_mtime, GMT4_TZ).isoformat(timespec="seconds"),
+            "tag": _backup_tag(name),
+            "format": None,
+            "size": st.st_size,
+            "sha256": None,
+            "records": None,
+            "validated": None,
+        })
+    log_event(f"📇 Rebuilt backup catalog from {len(records)} files")
+    return records
+
+backup_catalog.register_rebuild(_scan_backups)
+
+def _catalog_backup(path, size, sha256, count, validated, tag=None, fmt=None, created=None, base=None):
+    created = created or time.time()
+    backup_catalog.add({
+        "file": os.path.basename(path),
+        "created": created,
+        "timestamp": datetime.fromtimestamp(created, GMT4_TZ).isoformat(timespec="seconds"),
+        "tag": tag,
+        "format": fmt,
+        "size": size,
+        "sha256": sha256,
+        "records": count,
+        "validated": validated,
+        "base": base,
+    })
+
+def _read_catalogued(record):
+    """Read a catalogued backup, refusing content that no longer matches its hash."""
+    path = os.path.join(BACKUP_FOLDER, record["file"])
+    with open(path, "rb") as f:
+        raw = f.read()
+    if record.get("sha256") and hashlib.sha256(raw).hexdigest() != record["sha256"]:
+        raise ValueError("checksum mismatch")
+    data = decode_scores(raw)
+    if isinstance(data, dict):  # sharded manifest or delta
+        return read_snapshot(path)
+    return data
+
+def list_backups():
+    """Catalogued backups, newest first (rebuilt from the folder if missing)."""
+    return backup_catalog.entries()
+
+def latest_backup(tag=None):
+    """Newest catalogued backup not known to be broken, optionally by tag."""
+    return backup_catalog.latest(tag)
+
+def _restore_from_backups():
+    """Recommit scores.json from the newest backup the catalog does not know to be broken."""
+    try:
+        for record in list_backups():
+            if record["validated"] is False:
+                continue
             try:
-                with open(backup_path, "r") as b:
-                    data = json.load(b)
-                if validate_scores(data):
-                    with open(SCORES_FILE, "w") as w:
-                        json.dump(data, w, indent=2)
-                    log_event(f"♻️ Restored scores.json from backup: {os.path.basename(backup_path)}")
-                    return data
+                data = _read_catalogued(record)
+                if not validate_scores(data):
+                    raise ValueError("Invalid format")
             except Exception as inner:
-                log_event(f"⚠️ Skipped invalid backup {os.path.basename(backup_path)}: {inner}")
+                backup_catalog.mark(record["file"], False)
+                log_event(f"⚠️ Skipped invalid backup {record['file']}: {inner}")
+                continue
+            commit_snapshot(encode_scores(data), len(data))
+            log_event(f"♻️ Restored scores.json from backup: {record['file']}")
+            return data
     except Exception as outer:
         log_event(f"❌ Failed to restore from backup: {outer}")
+    return None
 
-    return []
+snapshot_io.register_restore(_restore_from_backups)
 
+def register_backup(filename):
+    """Validate and catalog a backup file that was put in BACKUP_FOLDER by hand."""
+    path = os.path.join(BACKUP_FOLDER, filename)
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        data = read_snapshot(path)
+        validated = validate_scores(data)
+        count = len(data) if isinstance(data, list) else None
+    except DECODE_ERRORS:
+        validated, count = False, None
+    _catalog_backup(path, len(raw), hashlib.sha256(raw).hexdigest(), count, validated, tag=_backup_tag(filename))
+    return validated
 
-def _atomic_write(path: str, data: str):
-    """Write data to path atomically using Railway-compatible tmp file."""
-    tmp_path = path + ".tmp"
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(tmp_path, "w") as tmp:
-        tmp.write(data)
-        tmp.flush()
-        os.fsync(tmp.fileno())
-    os.replace(tmp_path, path)
+def forget_backup(filename):
+    backup_catalog.remove(filename)
 
-def save_scores(scores):
-    if not validate_scores(scores):
-        log_event("❌ Invalid scores format — skipping save.")
-        return
+def backup_dependents(filename):
+    """Catalogued delta backups built directly on filename."""
+    return [r["file"] for r in list_backups() if r.get("base") == filename]
 
-    os.makedirs(os.path.dirname(SCORES_FILE), exist_ok=True)
+def prune_backups(cutoff):
+    """Delete backups created before cutoff (unix time), keeping any base a newer delta needs."""
+    records = list_backups()
+    by_file = {r["file"]: r for r in records}
+    needed = set()
+    for record in records:
+        if record["created"] < cutoff:
+            continue
+        base = record.get("base")
+        while base and base not in needed:
+            needed.add(base)
+            base = by_file.get(base, {}).get("base")
 
-    try:
-        existing_hash = get_file_hash(SCORES_FILE)
-        current_hash = hashlib.md5(json.dumps(scores, sort_keys=True).encode()).hexdigest()
-        if existing_hash == current_hash:
-            return  # 🟡 Skip save — no change
-    except Exception:
-        pass  # continue to write if hash check fails
-
-    tmp_path = SCORES_FILE + ".tmp"
-    try:
-        with open(SCORES_FILE, "a+") as lock_f:
-            fcntl.flock(lock_f, fcntl.LOCK_EX)
-            data = json.dumps(scores, indent=2)
-            _atomic_write(SCORES_FILE, data)
-            fcntl.flock(lock_f, fcntl.LOCK_UN)
-        log_event("✅ Successfully saved scores.json")
-    except Exception as e:
-        log_event(f"❌ Failed to save scores.json directly: {e}")
+    removed = 0
+    for record in records:
+        if record["created"] >= cutoff or record["file"] in needed:
+            continue
         try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except Exception:
+            os.remove(os.path.join(BACKUP_FOLDER, record["file"]))
+        except FileNotFoundError:
             pass
+        except Exception as e:
+            log_event(f"⚠️ Skipped file {record['file']} due to error: {e}")
+            continue
+        forget_backup(record["file"])
+        removed += 1
+    # Journal older than every remaining backup has no base to replay onto
+    kept = [r["created"] for r in list_backups()]
+    journal.prune_archive(min(kept) if kept else cutoff)
+    prune_backup_shards()
+    backup_store.gc()
+    return removed
 
-def get_file_hash(path):
+def _commit_snapshot_for_backup():
+    """Compact if needed so scores.json holds the store, before a full-mode copy."""
+    if _version != _flushed_version or get_backend().has_pending():
+        flush_scores(force=True)
+        return
     try:
-        with open(path, "rb") as f:
-            return hashlib.md5(f.read()).hexdigest()
-    except Exception:
-        return None
+        with open(SCORES_FILE, "rb") as f:
+            committed = committed_meta(os.fstat(f.fileno())) is not None
+    except FileNotFoundError:
+        committed = False
+    if not committed:
+        flush_scores(force=True)  # no metadata for this file yet; recommit it
+
+def _open_committed():
+    """Open scores.json if it holds exactly the store; return (file, meta).
+
+    Returns (None, None) if anything changed since the snapshot was last
+    committed (see _commit_snapshot_for_backup). Caller holds scores_lock();
+    the open file stays valid after the lock is released because compaction
+    replaces scores.json rather than rewriting it.
+    """
+    if _version != _flushed_version or get_backend().has_pending():
+        return None, None
+    f = open(SCORES_FILE, "rb")
+    meta = committed_meta(os.fstat(f.fileno()))
+    if meta is None:
+        f.close()
+        return None, None
+    return f, meta
 
 def backup_scores(tag=None):
-    global _last_backup_time
+    """Write a backup of the live scores and catalog it; return its filename."""
+    global _last_backup_time, _backup_version, _backup_changed, _backup_chain
     now = time.time()
 
     if now - _last_backup_time < 60 and tag is None:
         log_event("⏳ Skipping backup (too soon after last one)")
-        return
+        return None
 
     _last_backup_time = now
     os.makedirs(BACKUP_FOLDER, exist_ok=True)
-    scores = load_scores()
-
-    current_hash = get_file_hash(SCORES_FILE)
-    latest_backup = sorted([
-        os.path.join(BACKUP_FOLDER, f)
-        for f in os.listdir(BACKUP_FOLDER)
-        if f.endswith(".json")
-    ], key=os.path.getmtime, reverse=True)
-
-    if latest_backup:
-        latest_path = latest_backup[0]
-        if get_file_hash(latest_path) == current_hash and tag is None:
-            log_event("🟡 Skipping backup — no changes since last snapshot.")
-            return
-
+    fmt = snapshot_format()
     timestamp = gmt4_now().strftime("%Y%m%d_%H%M%S_%f")  # use microseconds
     suffix = f"_{tag}" if tag else ""
-    backup_path = os.path.join(BACKUP_FOLDER, f"leaderboard_backup_{timestamp}{suffix}.json")
+    base_path = os.path.join(BACKUP_FOLDER, f"leaderboard_backup_{timestamp}{suffix}")
+    backup_path = base_path + SNAPSHOT_EXTENSIONS[fmt]
+    src = None
 
     try:
-        _atomic_write(backup_path, json.dumps(scores, indent=2))
+        if BACKUP_MODE == "full" and isinstance(get_backend(), JsonBackend) and (
+                tag is not None or data_version()[0] != _backup_version):
+            _commit_snapshot_for_backup()  # compacts outside the lock below
+        with scores_lock():
+            # The shared version: a leader that never loaded the store still sees changes
+            version = data_version()[0]
+            if version == _backup_version and tag is None:
+                log_event("🟡 Skipping backup — no changes since last snapshot.")
+                return None
+            backend = get_backend()
+            base, changed, data = None, _backup_changed, None
+            if BACKUP_MODE == "full" and isinstance(backend, JsonBackend):
+                # Fast path: copy the committed file, validated when it was written
+                src, meta = _open_committed()
+            if src is not None:
+                fmt, count, validated = meta["format"], meta["records"], True
+                backup_path = base_path + SNAPSHOT_EXTENSIONS[fmt]
+            else:
+                scores = list(iter_scores())
+                count = len(scores)
+                validated = validate_scores(scores)
+                if written := backend.backup(base_path):
+                    backup_path, fmt = written, "sharded"
+                    with open(written, "rb") as f:
+                        data = f.read()
+                elif BACKUP_MODE == "cas":
+                    backup_path, fmt = base_path + ".json", "cas"
+                    data = backup_store.write_manifest(backup_path, backup_store.put_records(scores))
+                elif _delta_possible(tag):
+                    base = _backup_chain[0]
+                    fmt = "json" if fmt == "indexed" else fmt  # deltas are plain objects
+                    backup_path = base_path + SNAPSHOT_EXTENSIONS[fmt]
+                    delta = {"format": "delta", "base": base, "users": [_index[u] for u in changed if u in _index]}
+                    data = encode_scores(delta, fmt)
+                else:
+                    data = encode_scores(scores, fmt)
+            _backup_changed = {}
+
+        if src is not None:
+            with src:
+                copy_file(src.fileno(), backup_path)
+            size, sha256 = meta["key"][2], meta["sha256"]
+        else:
+            if fmt not in ("sharded", "cas"):
+                atomic_write(backup_path, data)
+            size, sha256 = len(data), hashlib.sha256(data).hexdigest()
+        _backup_version = version
+        name = os.path.basename(backup_path)
+        _backup_chain = (name, _backup_chain[1] + 1 if base else 0)
+        _catalog_backup(backup_path, size, sha256, count, validated, tag=tag,
+                        fmt="delta" if base else fmt, created=now, base=base)
         log_event(f"💾 Backup saved: {backup_path}")
+        return name
     except Exception as e:
         log_event(f"❌ Failed to write backup file: {e}")
+        if src is not None:
+            src.close()
         try:
             os.remove(backup_path + ".tmp")
         except Exception:
             pass
+        with scores_lock():
+            _backup_changed = None  # changes may be missing from disk; start a new chain
+        return None
 
-# ------------------ Scheduled Backups ------------------
-def periodic_backup(interval_hours=6):
-    while True:
+def _delta_possible(tag):
+    """True if the next backup can be a delta on top of the previous one."""
+    last, depth = _backup_chain
+    return (
+        BACKUP_MODE == "delta"
+        and tag != "manual"          # manual backups are downloaded, keep them standalone
+        and _backup_changed is not None
+        and last is not None
+        and depth + 1 < BACKUP_FULL_EVERY
+        and os.path.exists(os.path.join(BACKUP_FOLDER, last))
+    )
+
+# ---------------- Point-in-time restore ----------------
+def rebuild_scores_at(target):
+    """Rebuild the score list as it stood at unix time target.
+
+    Starts from the newest backup written by backup_scores() at or before
+    target and replays the archived and live journal up to target. Only
+    reads files, so it runs without holding the store lock. Returns
+    (scores, report).
+    """
+    backend = get_backend()
+    segments = backend.journal_segments()
+    if segments is None:
+        raise ValueError(f"the {backend.name} backend keeps no journal to replay")
+
+    for base in list_backups():
+        # Uploaded or scanned files (no format) say nothing about the live state at their date
+        if base["created"] > target or base["format"] is None or base["validated"] is False:
+            continue
         try:
-            backup_scores()
+            scores = _read_catalogued(base)
+            if validate_scores(scores):
+                break
         except Exception as e:
-            log_event(f"❌ Scheduled backup error: {e}")
-        time.sleep(interval_hours * 3600)
+            log_event(f"⚠️ Backup {base['file']} unusable for point-in-time restore: {e}")
+        backup_catalog.mark(base["file"], False)
+    else:
+        raise ValueError("no usable backup taken before that time")
+
+    # Records before the backup was started are already in it
+    start, records = base["created"], []
+    for path, sealed in segments:
+        if sealed is not None and sealed < start:
+            continue
+        records.extend(r for r in journal.read_records(path) if start <= r.get("t", 0) <= target)
+    records.sort(key=lambda r: r["t"])
+    applied = journal.replay(scores, records)
+    return scores, {"base": base["file"], "base_timestamp": base["timestamp"], "records": applied}
+
+def diff_scores(old, new, limit=200):
+    """Per-user differences between two score lists, largest score moves first."""
+    before = {e["user_id"]: e for e in old}
+    after = {e["user_id"]: e for e in new}
+    changed = []
+    for uid, entry in after.items():
+        prev = before.get(uid)
+        if prev is None or prev == entry:
+            continue
+        changed.append({
+            "user_id": uid,
+            "fields": sorted(k for k in prev.keys() | entry.keys() if prev.get(k) != entry.get(k)),
+            "score": [prev.get("score", 0), entry.get("score", 0)],
+        })
+    changed.sort(key=lambda c: abs(c["score"][1] - c["score"][0]), reverse=True)
+    added = [uid for uid in after if uid not in before]
+    removed = [uid for uid in before if uid not in after]
+    return {
+        "counts": {"added": len(added), "removed": len(removed), "changed": len(changed)},
+        "added": added[:limit],
+        "removed": removed[:limit],
+        "changed": changed[:limit],
+    }
+
+def restore_scores_at(target, dry_run=False):
+    """Point-in-time restore to unix time target; returns a report.
+
+    The rebuild happens off-lock; only the final swap pauses writers (in
+    every worker process). With dry_run the live store is left alone and
+    the report carries a per-user diff instead.
+    """
+    started = time.time()
+    scores, report = rebuild_scores_at(target)
+    report["users"] = len(scores)
+    if dry_run:
+        with scores_lock():
+            current = list(get_scores())
+        report["diff"] = diff_scores(current, scores)
+    elif not replace_scores(scores):
+        raise ValueError("rebuilt scores failed validation")
+    report["seconds"] = round(time.time() - started, 3)
+    log_event(f"⏪ {'Dry-run of p' if dry_run else 'P'}oint-in-time restore to "
+              f"{datetime.fromtimestamp(target, GMT4_TZ).isoformat(timespec='seconds')}: "
+              f"{report['base']} + {report['records']} journal records in {report['seconds']}s")
+    return report
+
+# ----------------- Maintenance jobs --------------------
+# Registered with utils.maintenance in main.py.
+def compact_scores():
+    """Periodic compaction (leader only): fold every worker's journal into the snapshot."""
+    pending = get_backend().has_pending()
+    if pending or (_scores is not None and _version != _flushed_version):
+        flush_scores(force=pending)
+
+def prune_expired_backups():
+    """Delete backups older than BACKUP_RETENTION_DAYS."""
+    removed = prune_backups(time.time() - BACKUP_RETENTION_DAYS * 86400)
+    if removed:
+        log_event(f"🧹 Pruned {removed} backups older than {BACKUP_RETENTION_DAYS} days")
 
-# ✅ Launch background scheduler at runtime
-threading.Thread(target=periodic_backup, daemon=True).start()
+def warm_score_caches():
+    """Per-worker: catch up with other workers before a request has to."""
+    if _scores is not None:
+        leaderboard_snapshot()
@@ -13,3 +13,13 @@ def gmt4_now() -> datetime:
 def gmt4_timestamp() -> str:
     """Current timestamp in GMT-4."""
     return gmt4_now().isoformat(timespec="seconds")
+
+
+def parse_gmt4(value: str) -> datetime:
+    """Parse a unix timestamp or ISO 8601 string; naive times are taken as GMT-4."""
+    try:
+        return datetime.fromtimestamp(float(value), GMT4_TZ)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=GMT4_TZ)
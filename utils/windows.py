@@ -0,0 +1,117 @@
+# utils/windows.py
+"""
+Time-windowed leaderboards: hourly, daily, weekly and season.
+
+Score gains are accumulated in the entry itself, one bucket per window:
+    "windows": {"daily": ["20261018", 40], "weekly": ["2026W42", 120], ...}
+A bucket counts only while its period key is the current one (GMT-4), so
+old buckets expire on their own and are overwritten by the next gain.
+Riding in the entry, they are journalled, shared between workers, compacted
+and backed up like everything else.
+
+Each window keeps a RankIndex over the current period; when the period
+rolls over it simply starts empty, so windowed rank lookups cost the same
+O(log n) as all-time ones.
+"""
+import os
+import threading
+from datetime import datetime
+from .ranking import RankIndex
+from .timeutils import GMT4_TZ
+
+WINDOWS = ("hourly", "daily", "weekly", "season")
+
+# Seasons are calendar months unless LEADERBOARD_SEASON_START (ISO date,
+# GMT-4) is set, then consecutive LEADERBOARD_SEASON_DAYS-long periods.
+SEASON_START = os.getenv("LEADERBOARD_SEASON_START")
+SEASON_DAYS = int(os.getenv("LEADERBOARD_SEASON_DAYS", "28"))
+
+
+def period_keys(now: float) -> dict:
+    """Current period key of every window at unix time now."""
+    t = datetime.fromtimestamp(now, GMT4_TZ)
+    year, week, _ = t.isocalendar()
+    if SEASON_START:
+        start = datetime.fromisoformat(SEASON_START).replace(tzinfo=GMT4_TZ)
+        season = f"S{int((t - start).total_seconds() // (SEASON_DAYS * 86400))}"
+    else:
+        season = t.strftime("%Y-%m")
+    return {
+        "hourly": t.strftime("%Y%m%d%H"),
+        "daily": t.strftime("%Y%m%d"),
+        "weekly": f"{year}W{week:02d}",
+        "season": season,
+    }
+
+
+def window_score(entry: dict, name: str, key: str) -> int:
+    bucket = (entry.get("windows") or {}).get(name)
+    return bucket[1] if bucket and bucket[0] == key else 0
+
+
+def add_gain(entry: dict, delta: int, keys: dict) -> None:
+    """Add a score change to the entry's current buckets (never below zero)."""
+    windows = entry.setdefault("windows", {})
+    for name in WINDOWS:
+        windows[name] = [keys[name], max(0, window_score(entry, name, keys[name]) + delta)]
+
+
+class WindowedRanks:
+    """One RankIndex per window, for its current period."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ranks = {name: (None, RankIndex()) for name in WINDOWS}
+
+    def _current(self, name, key):
+        with self._lock:
+            period, ranks = self._ranks[name]
+            if period != key:
+                # New period: every bucket on record belongs to an older one
+                ranks = RankIndex()
+                self._ranks[name] = (key, ranks)
+            return ranks
+
+    def update(self, entry: dict, keys: dict) -> None:
+        for name in WINDOWS:
+            self._current(name, keys[name]).update(entry["user_id"], window_score(entry, name, keys[name]))
+
+    def rebuild(self, scores: list[dict], keys: dict) -> None:
+        with self._lock:
+            for name in WINDOWS:
+                ranks = RankIndex()
+                ranks.rebuild([
+                    {"user_id": e["user_id"], "score": window_score(e, name, keys[name])}
+                    for e in scores if isinstance(e.get("windows"), dict)
+                ])
+                self._ranks[name] = (keys[name], ranks)
+
+    def index(self, name: str, keys: dict) -> RankIndex:
+        return self._current(name, keys[name])
+
+
+class WindowBoard:
+    """Read view of one window's ranking, shaped like a LeaderboardSnapshot."""
+
+    def __init__(self, name, period, ranks, version, name_of):
+        self.name = name
+        self.period = period
+        self.version = version
+        self._ranks = ranks
+        self._name_of = name_of
+
+    def __len__(self) -> int:
+        return len(self._ranks)
+
+    def page(self, start: int = 0, stop: int | None = None) -> list[tuple]:
+        return [(uid, self._name_of(uid), -neg) for neg, _, uid in self._ranks.key_slice(start, stop)]
+
+    def key_at(self, i: int) -> tuple:
+        return self._ranks.key_at(i)
+
+    def index_after(self, key: tuple) -> int:
+        return self._ranks.index_after(key)
+
+    def position(self, user_id: str) -> int | None:
+        ranked = self._ranks.lookup(user_id)
+        return None if ranked is None else ranked["rank"] - 1